@@ -1,12 +1,17 @@
 # app.py
 import os
 import io
+import copy
+import functools
+import hashlib
 import time
 import re
 from datetime import datetime, date
 import random
+import numpy as np
 import pandas as pd
 import streamlit as st
+from openpyxl import load_workbook
 
 # =========================
 # CONFIG
@@ -21,8 +26,58 @@ EMPLOYEE_SHEET_NAME = "employee"  # where we'll write edited personnel
 
 REQUIRED_COLS = ["Name", "Qualification", "Job Title", "From", "Years of Experience"]
 
+# Date formats accepted in the 'From' column
+MM_YYYY_RE = re.compile(r"^\s*(\d{1,2})[-/](\d{4})\s*$")                 # 06-2022, 6/2022
+MM_YYYY_STRICT_RE = re.compile(r"^(\d{1,2})-(\d{4})$")                     # 06-2022 only (what users type in)
+DD_MM_YYYY_RE = re.compile(r"^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{4})\s*$")  # 01-01-2006
+YEAR_RE = re.compile(r"^\d{4}$")                                         # 2017
+# The same three fused into one alternation, so a whole column is matched in one pass
+DATE_RE = re.compile(
+    r"^\s*(?:(?P<mm>\d{1,2})[-/](?P<yyyy>\d{4})"
+    r"|(?P<dd>\d{1,2})[-/](?P<mm2>\d{1,2})[-/](?P<yyyy2>\d{4})"
+    r"|(?P<year>\d{4}))\s*$"
+)
+
+# Excel reader engine: calamine (Rust) when installed, else pandas' default openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READ_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READ_ENGINE = "openpyxl"
+
+# Excel writer engine: xlsxwriter is much faster than openpyxl for plain dumps
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITE_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_WRITE_ENGINE = "openpyxl"
+
+# Multi-keyword substring search: one Aho-Corasick pass when pyahocorasick is installed, else a regex per role
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Step 1 only reports date formats as a hint, so it looks at this many 'From' values at most
+FORMAT_SAMPLE_ROWS = 5000
+
+# Arrow-backed string dtype with NaN as the missing marker (pandas 3's default "str"); None on older pandas
+try:
+    TEXT_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)
+except TypeError:
+    TEXT_DTYPE = None
+
+# Step 1 previews only ship this many rows to the browser (row totals are shown separately)
+PREVIEW_ROWS = 500
+
+# Step 3 lists at most this many converted / unsupported 'From' dates (the rest are only counted)
+MESSAGE_PREVIEW_ROWS = 10
+
+# Role search: one bit per filter, packed into a uint8 per row
+MATCH_TITLE, MATCH_EXP, MATCH_QUAL, MATCH_DIPLOMA = 1, 2, 4, 8
+MATCH_ALL = MATCH_TITLE | MATCH_EXP | MATCH_QUAL | MATCH_DIPLOMA
+
 SAVE_DIR = "temp_uploads"
-OUTPUT_DOCX = os.path.abspath("Employees_CV.docx")
 os.makedirs(SAVE_DIR, exist_ok=True)
 
 st.set_page_config(page_title="Key Personnel • Editor & Bulk CVs", layout="wide")
@@ -36,12 +91,16 @@ def init_state():
     ss.setdefault("df_personnel", None)        # the working personnel dataframe
     ss.setdefault("df_project_info", None)     # loaded from PROJECT_WB_PATH / project_info
     ss.setdefault("roles", [])                 # list of dicts: {name, count, min_exp, degree_required}
+    ss.setdefault("roles_by_name", {})         # lowercased role name -> index in roles
     ss.setdefault("selection_mask", None)
+    ss.setdefault("selection_count", 0)        # selection_mask.sum(), kept alongside it
     ss.setdefault("current_edit_path", None)   # temp_uploads file we keep overwriting after first save
+    ss.setdefault("last_saved_digest", None)   # frame_fingerprint of what was last written there
     ss.setdefault("files_loaded", False)       # flag to track if files have been auto-loaded
     ss.setdefault("files_confirmed", False)    # flag to track if user confirmed the loaded files
     ss.setdefault("job_title_mode", None)      # "existing" or "assign_roles"
     ss.setdefault("defined_roles", [])         # roles defined for assignment in Step 3
+    ss.setdefault("defined_roles_set", set())  # same names, for membership tests
     ss.setdefault("roles_defined_step3", False) # flag to track if roles are defined in step 3
 
 init_state()
@@ -50,6 +109,9 @@ init_state()
 # UTILS
 # =========================
 def ensure_required_cols(df: pd.DataFrame) -> pd.DataFrame:
+    # Usual case: schema already complete, so hand the frame back without copying
+    if all(c in df.columns for c in REQUIRED_COLS) and "Assigned Role" in df.columns and "To" in df.columns:
+        return df
     df = df.copy()
     for c in REQUIRED_COLS:
         if c not in df.columns:
@@ -62,6 +124,15 @@ def ensure_required_cols(df: pd.DataFrame) -> pd.DataFrame:
         df["To"] = f"{today.month:02d}-{today.year}"
     return df
 
+def downcast_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Store pure-text object columns as TEXT_DTYPE; mixed columns (e.g. From with real dates) stay object"""
+    if TEXT_DTYPE is None:
+        return df
+    for c in df.columns:
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) in ("string", "empty"):
+            df[c] = df[c].astype(TEXT_DTYPE)
+    return df
+
 def save_temp_excel(df: pd.DataFrame, fixed_path: str | None = None) -> str:
     """
     If fixed_path is provided, overwrite it; else create a timestamped file in temp_uploads.
@@ -76,21 +147,22 @@ def save_temp_excel(df: pd.DataFrame, fixed_path: str | None = None) -> str:
     
     # Ensure date columns are stored as strings in MM-YYYY format
     if "From" in df_save.columns:
-        df_save["From"] = df_save["From"].apply(lambda x: str(x) if pd.notna(x) and str(x).strip() != "" else "")
+        from_str = df_save["From"].astype(object).astype(str)
+        df_save["From"] = from_str.where(df_save["From"].notna() & from_str.str.strip().ne(""), "")
     if "To" in df_save.columns:
         # Store "To" as "Present" in Excel files
         df_save["To"] = "Present"
     
     # Ensure Years of Experience is integer
     if "Years of Experience" in df_save.columns:
-        df_save["Years of Experience"] = df_save["Years of Experience"].apply(lambda x: int(float(x)) if pd.notna(x) else 0)
+        df_save["Years of Experience"] = pd.to_numeric(df_save["Years of Experience"], errors="coerce").fillna(0).astype("int64")
     
     if fixed_path:
-        df_save.to_excel(fixed_path, index=False)
+        df_save.to_excel(fixed_path, index=False, engine=EXCEL_WRITE_ENGINE)
         return fixed_path
     ts = time.strftime("%Y%m%d_%H%M%S")
     p = os.path.join(SAVE_DIR, f"personnel_temp_{ts}.xlsx")
-    df_save.to_excel(p, index=False)
+    df_save.to_excel(p, index=False, engine=EXCEL_WRITE_ENGINE)
     return p
 
 def parse_from_to_date(val):
@@ -110,18 +182,18 @@ def parse_from_to_date(val):
         return None
 
     # Handle MM-YYYY or MM/YYYY format
-    mm_yyyy_match = re.match(r"^\s*(\d{1,2})[-/](\d{4})\s*$", s)
+    mm_yyyy_match = MM_YYYY_RE.match(s)
     if mm_yyyy_match:
         mm = max(1, min(12, int(mm_yyyy_match.group(1))))
         yy = int(mm_yyyy_match.group(2))
         return date(yy, mm, 1)
 
     # Handle year-only format (e.g., "2017" -> assumes 01-2017)
-    if s.isdigit() and len(s) == 4:
+    if YEAR_RE.match(s):
         return date(int(s), 1, 1)
     
     # Handle DD-MM-YYYY or DD/MM/YYYY format (e.g., 01-01-2006, 09-12-2006)
-    dd_mm_yyyy_match = re.match(r"^\s*(\d{1,2})[-/](\d{1,2})[-/](\d{4})\s*$", s)
+    dd_mm_yyyy_match = DD_MM_YYYY_RE.match(s)
     if dd_mm_yyyy_match:
         dd = int(dd_mm_yyyy_match.group(1))
         mm = max(1, min(12, int(dd_mm_yyyy_match.group(2))))
@@ -135,86 +207,367 @@ def parse_from_to_date(val):
     except Exception:
         return None
 
-def convert_to_mm_yyyy_format(val):
-    """Convert various date formats to MM-YYYY string format"""
-    if pd.isna(val) or val is None:
-        return ""
-    
-    # Already a datetime/Timestamp/date object
-    if isinstance(val, (datetime, pd.Timestamp, date)):
-        return f"{val.month:02d}-{val.year}"
-    
-    s = str(val).strip()
-    if not s:
-        return ""
-    
-    # Already in MM-YYYY format
-    if re.match(r"^\d{1,2}-\d{4}$", s):
-        parts = s.split('-')
-        mm = int(parts[0])
-        yy = parts[1]
-        return f"{mm:02d}-{yy}"
-    
-    # Year only (e.g., "2017") -> "01-2017"
-    if s.isdigit() and len(s) == 4:
-        return f"01-{s}"
-    
-    # DD-MM-YYYY format (e.g., "01-01-2006") -> "01-2006"
-    dd_mm_yyyy_match = re.match(r"^(\d{1,2})[-/](\d{1,2})[-/](\d{4})$", s)
-    if dd_mm_yyyy_match:
-        mm = int(dd_mm_yyyy_match.group(2))
-        yy = dd_mm_yyyy_match.group(3)
-        return f"{mm:02d}-{yy}"
-    
-    # Try to parse as date
+def parse_dates_vectorized(series: pd.Series) -> pd.DatetimeIndex:
+    """Column-wide parse_from_to_date: month-start timestamps, NaT where a value can't be parsed"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.DatetimeIndex(series.dt.to_period("M").dt.to_timestamp())
+
+    # Work positionally so duplicate index labels can't cross-assign
+    series = series.reset_index(drop=True)
+    # Datetime objects stringify to ISO dates, so they land in the general parse below
+    s = series[series.notna()].astype(str).str.strip()
+    s = s[s != ""]
+    out = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+
+    m = s.str.extract(DATE_RE).astype("float64")
+    # Only one alternative can match, so the groups are simply layered
+    year = m["yyyy"].fillna(m["yyyy2"]).fillna(m["year"])
+    month = m["mm"].fillna(m["mm2"]).mask(m["year"].notna(), 1.0)
+
+    matched = year.notna()
+    parts = pd.DataFrame({"year": year[matched], "month": month[matched].clip(1, 12), "day": 1})
+    out.loc[parts.index] = pd.to_datetime(parts, errors="coerce")
+
+    # Try general date parsing on whatever the regexes didn't recognise
+    rest = s[~matched]
+    if not rest.empty:
+        parsed = pd.to_datetime(rest, errors="coerce", format="mixed")
+        out.loc[rest.index] = parsed.dt.to_period("M").dt.to_timestamp()
+    return pd.DatetimeIndex(out)
+
+def unparsable_dates(series: pd.Series) -> np.ndarray:
+    """Positional mask of values pd.to_datetime can't parse at all"""
+    bad = np.zeros(len(series), dtype=bool)
+    if series.empty:
+        return bad
     try:
-        d = pd.to_datetime(s, errors="raise")
-        return f"{d.month:02d}-{d.year}"
-    except:
-        return ""  # Return empty instead of error
-
-def years_since(d: date) -> int:
+        retry = pd.to_datetime(series.astype(object), errors="coerce", format="mixed").isna().to_numpy()
+    except (ValueError, TypeError):
+        retry = np.ones(len(series), dtype=bool)
+    # Scalar parsing is more lenient than the batch one (e.g. 'NaT'), so only its failures count
+    for i in np.flatnonzero(retry):
+        try:
+            pd.to_datetime(series.iat[i])
+        except (ValueError, TypeError, OverflowError, pd.errors.OutOfBoundsDatetime):
+            bad[i] = True
+    return bad
+
+def convert_to_mm_yyyy_series(series: pd.Series) -> pd.Series:
+    """Convert a column of dates in various formats (MM-YYYY, DD-MM-YYYY, year only, date objects, other
+    parseable dates) to MM-YYYY strings, '' where a value is missing or can't be converted"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime("%m-%Y").fillna("").astype(object)
+
+    index = series.index
+    series = series.reset_index(drop=True)
+    s = series[series.notna()].astype(str).str.strip()
+    s = s[s != ""]
+    out = pd.Series("", index=series.index, dtype=object)
+
+    # MM-YYYY, year-only and DD-MM-YYYY can't overlap, so their matches are simply layered
+    my = s.str.extract(MM_YYYY_STRICT_RE)
+    dmy = s.str.extract(DD_MM_YYYY_RE)
+    y_only = s.str.fullmatch(YEAR_RE).fillna(False).astype(bool)
+    mm = my[0].fillna(dmy[1]).mask(y_only, "1")
+    yy = my[1].fillna(dmy[2]).mask(y_only, s)
+    matched = yy.notna()
+    out.loc[matched[matched].index] = (mm[matched].str.zfill(2) + "-" + yy[matched]).astype(object)
+
+    # Try to parse whatever the regexes didn't recognise
+    rest = s[~matched]
+    if not rest.empty:
+        parsed = pd.to_datetime(rest, errors="coerce", format="mixed")
+        out.loc[rest.index] = parsed.dt.strftime("%m-%Y").fillna("").astype(object)
+    return out.set_axis(index)
+
+def classify_from_formats(series: pd.Series, limit: int = FORMAT_SAMPLE_ROWS) -> dict:
+    """Count year-only, DD-MM-YYYY and unrecognised values among the first `limit` non-empty 'From' values (date objects aren't counted)"""
+    vals = series.dropna()
+    sampled = len(vals) > limit
+    vals = vals.head(limit)
+    s = vals.astype(str).str.strip()
+    # One DATE_RE pass classifies every value; the matching group tells the format.
+    # Known formats are 4 (2017) to 10 (01-01-2006) chars, so only those lengths reach the regex
+    lens = s.str.len()
+    m = s[lens.between(4, 10)].str.extract(DATE_RE).reindex(s.index)
+    year_only = m["year"].notna()
+    dd_mm_yyyy = m["yyyy2"].notna()
+    is_date = vals.map(lambda v: isinstance(v, (datetime, pd.Timestamp, date))).astype(bool)
+    other = ~(year_only | dd_mm_yyyy | m["yyyy"].notna() | is_date)
+    return {"year_only": int(year_only.sum()), "dd_mm_yyyy": int(dd_mm_yyyy.sum()), "other": int(other.sum()), "sampled": sampled}
+
+def years_since(d: date, today: date | None = None) -> int:
     """Calculate years of experience as integer (floor value, no decimals)"""
     if d is None:
         return 0
-    today = date.today()
+    today = today or date.today()
     end = date(today.year, today.month, 1)
     months = (end.year - d.year) * 12 + (end.month - d.month)
     # Return integer years (floor division)
     return int(months // 12)
 
-def recalc_yoe_for_from_column(df: pd.DataFrame) -> pd.DataFrame:
+def years_since_series(dt: pd.Series, today: date | None = None) -> np.ndarray:
+    """Column-wide years_since for a datetime series (0 where the date is missing)"""
+    today = today or date.today()
+    # Whole months since each date, against today's month index computed once
+    months = (today.year * 12 + today.month) - (dt.dt.year * 12 + dt.dt.month)
+    return (months // 12).fillna(0).astype("int64").to_numpy()
+
+def recalc_yoe_for_from_column(df: pd.DataFrame, today: date | None = None) -> pd.DataFrame:
     """Recalculate Years of Experience based on From date, returns integer years"""
-    df = df.copy()
-    y = []
-    for _, r in df.iterrows():
-        d = parse_from_to_date(r.get("From"))
-        if d:
-            y.append(years_since(d))
-        else:
-            # If no From date, try to use existing YOE as integer
-            existing = r.get("Years of Experience", 0)
-            try:
-                y.append(int(float(existing)))
-            except:
-                y.append(0)
-    df["Years of Experience"] = y
+    # Only the YOE column is replaced, so a shallow copy keeps the caller's frame untouched
+    df = df.copy(deep=False)
+    from_col = df["From"] if "From" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    from_dt = pd.Series(parse_dates_vectorized(from_col), index=df.index)
+    # If no From date, fall back to existing YOE as integer (0 if not numeric)
+    if "Years of Experience" in df.columns:
+        existing = pd.to_numeric(df["Years of Experience"], errors="coerce")
+    else:
+        existing = pd.Series(0.0, index=df.index)
+    existing = np.trunc(existing.astype("float64").replace([np.inf, -np.inf], np.nan).fillna(0))
+    df["Years of Experience"] = np.where(from_dt.notna(), years_since_series(from_dt, today), existing.astype("int64"))
     return df
 
-def ci_contains(text: str, needle: str) -> bool:
-    t = str(text or "")
-    n = str(needle or "")
-    return n.lower() in t.lower() if n else False
+DIPLOMA_RE = re.compile(r"\bdiploma\b", flags=re.I)
+
+# Characters the exact-word qualification search treats as word separators
+QUAL_WORD_SEPS = r"\s\.\,\/\(\)\-"
+
+@functools.lru_cache(maxsize=256)
+def keyword_pattern(keywords: tuple[str, ...]) -> re.Pattern:
+    """One regex matching any of the (lowercase) keywords as a substring; the contains-mode fallback without Aho-Corasick"""
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
+
+def contains_keyword_masks(qual_lower: pd.Series, keywords: tuple[str, ...]) -> dict[str, np.ndarray]:
+    """Row mask per (lowercase) keyword for substring matching, from one Aho-Corasick pass over the distinct values"""
+    codes, uniques = pd.factorize(qual_lower)  # missing -> -1, i.e. the always-False last column below
+    automaton = ahocorasick.Automaton()
+    for i, kw in enumerate(keywords):
+        if kw:
+            automaton.add_word(kw, i)
+    hits = np.zeros((len(keywords), len(uniques) + 1), dtype=bool)
+    for i, kw in enumerate(keywords):
+        if not kw:
+            hits[i, :-1] = True  # the empty keyword is found in any text
+    if len(automaton):
+        automaton.make_automaton()
+        for j, text in enumerate(uniques):
+            for _, i in automaton.iter(text):
+                hits[i, j] = True
+    return {kw: hits[i, codes] for i, kw in enumerate(keywords)}
+
+def _lower_text(s: pd.Series) -> pd.Series:
+    """Lowercased text as Arrow-backed strings (TEXT_DTYPE), NaN where the value is missing"""
+    out = s.astype(str).str.lower().where(s.notna())
+    return out.astype(TEXT_DTYPE) if TEXT_DTYPE is not None else out
+
+def _word_sets(s: pd.Series) -> list[frozenset]:
+    """Separator-delimited words of each value (empty set where missing), for exact keyword matching"""
+    parts = s.str.split(f"[{QUAL_WORD_SEPS}]+", regex=True)
+    return [frozenset(p) if isinstance(p, list) else frozenset() for p in parts]
+
+@st.cache_data(show_spinner=False)
+def search_columns(fingerprint: str, _df: pd.DataFrame) -> pd.DataFrame:
+    """Role-independent Step 2 search inputs: numeric YOE, lowercased title/qualification (NaN if missing),
+    qualification word sets, diploma flag. Keyed on frame_fingerprint of the personnel frame."""
+    df = _df
+    qual_lower = _lower_text(df["Qualification"])
+    return pd.DataFrame({
+        "yoe": pd.to_numeric(df["Years of Experience"], errors="coerce").fillna(0.0),
+        "title_lower": _lower_text(df["Job Title"]),
+        "qual_lower": qual_lower,
+        "qual_words": pd.Series(_word_sets(qual_lower), index=df.index, dtype=object),
+        "is_diploma": df["Qualification"].astype(str).str.contains(DIPLOMA_RE, na=False).astype(bool),
+    }, index=df.index)
+
+@st.cache_data(show_spinner=False)
+def search_roles(fingerprint: str, roles: list[dict], _df: pd.DataFrame) -> list[tuple[pd.DataFrame, ...]]:
+    """Step 2 search: per role, the (fully, title+qual no exp, qual+exp no title, qual only, no match) rows of _df.
+    Cached on frame_fingerprint(_df) and the role definitions, so pressing Search again with nothing changed is instant."""
+    df = _df
+    # Role-independent prep, done once for all roles and cached across reruns
+    prep = search_columns(fingerprint, df[["Job Title", "Qualification", "Years of Experience"]])
+    yoe = prep["yoe"].to_numpy()
+    title_lower = prep["title_lower"]
+    qual_lower = prep["qual_lower"]
+    qual_words = prep["qual_words"].tolist()
+    is_diploma = prep["is_diploma"].to_numpy(dtype=bool)
+
+    # Result columns, projected once; slices are only displayed so they aren't copied
+    df_proj = df[["Name", "Qualification", "Job Title", "From", "Years of Experience"]]
+
+    def safe_extract(mask):
+        """Rows of df_proj where mask is set (positional, so index labels don't matter)"""
+        return df_proj.take(np.flatnonzero(mask)).reset_index(drop=True)
+
+    # All masks below are plain numpy bool arrays, so combining them does no index alignment.
+    # Shared constant masks for filters that don't apply (only ever combined, never modified)
+    all_true = np.ones(len(df), dtype=bool)
+    all_false = np.zeros(len(df), dtype=bool)
+
+    # Contains-mode keywords of every role, matched in a single pass when Aho-Corasick is available
+    kw_masks = None
+    if ahocorasick is not None:
+        contains_kws = {
+            kw for r in roles if r.get("search_mode", "contains") != "exact"
+            for kw in r.get("keywords", [])
+        }
+        if contains_kws:
+            kw_masks = contains_keyword_masks(qual_lower, tuple(sorted(contains_kws)))
+
+    # Otherwise one substring regex per contains-mode role, compiled before scanning (and memoised across searches)
+    qual_patterns = [
+        keyword_pattern(tuple(r["keywords"]))
+        if kw_masks is None and r.get("search_mode", "contains") != "exact" and r.get("keywords") else None
+        for r in roles
+    ]
+
+    # Inverted index word -> row positions for exact-mode roles, so they never rescan the column
+    word_rows = {}
+    if any(r.get("search_mode", "contains") == "exact" and r.get("keywords") for r in roles):
+        postings = {}
+        for i, words in enumerate(qual_words):
+            for w in words:
+                postings.setdefault(w, []).append(i)
+        word_rows = {w: np.asarray(rows, dtype=np.intp) for w, rows in postings.items()}
+
+    def run_role(role, pat):
+        """Scan one role and split the rows into the five result groups"""
+        role_name = role["name"]
+        min_exp = float(role.get("min_exp", 0.0))
+        keywords = role.get("keywords", [])
+        include_diploma = role.get("include_diploma", False)
+
+        # Title matching (case-insensitive substring of the role name)
+        if role_name:
+            title_hit = title_lower.str.contains(role_name.lower(), regex=False, na=False).to_numpy(dtype=bool)
+        else:
+            title_hit = all_false
+
+        # Experience filter
+        if min_exp > 0:
+            exp_ok = yoe >= min_exp
+        else:
+            exp_ok = all_true
+
+        # Qualification filter (missing qualifications never match)
+        if keywords:
+            # Exact: whole words split on spaces, dots, commas, slashes, parentheses, dashes
+            # ("civil" matches "B.E. Civil"); Contains: keyword found anywhere (substring match)
+            if role.get("search_mode", "contains") == "exact":
+                # Union of the keywords' posting lists (a keyword containing a separator is never a word)
+                qual_ok = np.zeros(len(df), dtype=bool)
+                for kw in keywords:
+                    rows = word_rows.get(kw)
+                    if rows is not None:
+                        qual_ok[rows] = True
+            elif kw_masks is not None:
+                qual_ok = np.logical_or.reduce([kw_masks[kw] for kw in keywords])
+            else:
+                qual_ok = qual_lower.str.contains(pat, na=False).to_numpy(dtype=bool)
+        else:
+            qual_ok = all_true
+
+        # Diploma filter
+        if include_diploma:
+            # Include everyone (diploma or not)
+            diploma_ok = all_true
+        else:
+            # Exclude diploma holders
+            diploma_ok = ~is_diploma
+
+        # Combined filters - Enhanced categorization
+        # Adjust categorization based on which filters are actually active
+        has_qual_filter = bool(keywords)
+        has_exp_filter = min_exp > 0
+
+        # Pack the four predicates into one byte per row; each category is then a single compare
+        cat = (
+            title_hit.astype(np.uint8)
+            | (exp_ok.astype(np.uint8) << 1)
+            | (qual_ok.astype(np.uint8) << 2)
+            | (diploma_ok.astype(np.uint8) << 3)
+        )
+        qual_bits = MATCH_QUAL | MATCH_DIPLOMA
 
-def qualification_is_diploma(q: str) -> bool:
-    return bool(re.search(r"\bdiploma\b", str(q or ""), flags=re.I))
+        if has_qual_filter and has_exp_filter:
+            # All filters active - full categorization
+            # 1. Fully matched: Title + Experience + Qualification all match
+            fully_mask = cat == MATCH_ALL
 
-def sync_job_title_with_assigned_role(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    if "Assigned Role" in df.columns:
-        mask = df["Assigned Role"].astype(str).str.strip() != ""
-        df.loc[mask, "Job Title"] = df.loc[mask, "Assigned Role"]
-    return df
+            # 2. Title + Qualification match, but Experience insufficient
+            title_qual_no_exp_mask = cat == (MATCH_ALL & ~MATCH_EXP)
+
+            # 3. Qualification + Experience match, but Title mismatch
+            qual_exp_no_title_mask = cat == (MATCH_ALL & ~MATCH_TITLE)
+
+            # 4. Qualification only (no title, no experience)
+            qual_only_mask = cat == qual_bits
+
+            # 5. No match at all
+            no_match_mask = (cat & qual_bits) != qual_bits
+
+        elif has_qual_filter:
+            # Only qualification filter active (experience bit is always set)
+            # 1. Fully matched: Title + Qualification match
+            fully_mask = cat == MATCH_ALL
+
+            # 2. Qualification only (no title match)
+            qual_only_mask = cat == (MATCH_ALL & ~MATCH_TITLE)
+
+            # 3. No qualification match
+            no_match_mask = (cat & qual_bits) != qual_bits
+
+            # Not applicable
+            title_qual_no_exp_mask = all_false
+            qual_exp_no_title_mask = all_false
+
+        elif has_exp_filter:
+            # Only experience filter active (diploma is ignored here, as before)
+            title_exp = cat & (MATCH_TITLE | MATCH_EXP)
+            # 1. Fully matched: Title + Experience match
+            fully_mask = title_exp == (MATCH_TITLE | MATCH_EXP)
+
+            # 2. Experience but wrong title
+            qual_exp_no_title_mask = title_exp == MATCH_EXP
+
+            # 3. No experience match
+            no_match_mask = (cat & MATCH_EXP) == 0
+
+            # Not applicable
+            title_qual_no_exp_mask = all_false
+            qual_only_mask = all_false
+
+        else:
+            # No filters - only title matching
+            # 1. Fully matched: Title matches
+            fully_mask = (cat & MATCH_TITLE) != 0
+
+            # 2. No title match
+            no_match_mask = ~fully_mask
+
+            # Not applicable
+            title_qual_no_exp_mask = all_false
+            qual_exp_no_title_mask = all_false
+            qual_only_mask = all_false
+
+        # Extract results - just get the data, no formatting
+        fully = safe_extract(fully_mask)
+        title_qual_no_exp = safe_extract(title_qual_no_exp_mask)
+        qual_exp_no_title = safe_extract(qual_exp_no_title_mask)
+        qual_only = safe_extract(qual_only_mask)
+        no_match = safe_extract(no_match_mask)
+        return fully, title_qual_no_exp, qual_exp_no_title, qual_only, no_match
+
+    return [run_role(r, p) for r, p in zip(roles, qual_patterns)]
+
+def display_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Blank-filled all-text copy for st.dataframe; string columns stay Arrow-backed and are only filled"""
+    return df.assign(**{
+        c: df[c].fillna("") if pd.api.types.is_string_dtype(df[c].dtype) and df[c].dtype != object
+        else df[c].fillna("").astype(str)
+        for c in df.columns
+    })
 
 # ---- NEW: safe metric wrapper so React gets plain types ----
 def safe_metric(label, value, delta=None):
@@ -228,9 +581,308 @@ def safe_metric(label, value, delta=None):
     d = None if delta is None else str(delta)
     st.metric(str(label), v, delta=d)
 
+def analyze_personnel(df: pd.DataFrame) -> tuple[list[str], list[str], list[str]]:
+    """Validate a personnel frame for Step 1; returns (issues, warnings, info_msgs)"""
+    issues = []
+    warnings = []
+    info_msgs = []
+    cols = frozenset(df.columns)
+
+    # Check for missing required columns
+    missing_cols = [col for col in REQUIRED_COLS if col not in cols]
+    if missing_cols:
+        issues.append(f"❌ Missing required columns: {', '.join(missing_cols)}")
+
+    # Check for missing values in key columns (one isna pass over all of them)
+    na_counts = df.reindex(columns=["Name", "From", "To", "Years of Experience"]).isna().sum()
+
+    if "Name" in cols and na_counts["Name"] > 0:
+        warnings.append(f"⚠️ {na_counts['Name']} rows have missing Names")
+
+    if "From" in cols:
+        if na_counts["From"] > 0:
+            warnings.append(f"⚠️ {na_counts['From']} rows have missing 'From' dates - YOE will be 0")
+
+        # Check for various date formats (nothing to classify if Excel already gave real dates)
+        if pd.api.types.is_datetime64_any_dtype(df["From"]):
+            info_msgs.append("ℹ️ 'From' column already holds real dates - they will be shown as MM-YYYY in Step 3")
+        else:
+            fmt = classify_from_formats(df["From"])
+            if fmt["year_only"] > 0 or fmt["dd_mm_yyyy"] > 0 or fmt["other"] > 0:
+                info_msgs.append(f"ℹ️ Date formats detected{f' in the first {FORMAT_SAMPLE_ROWS:,} dates' if fmt['sampled'] else ''}: {fmt['year_only']} year-only (2017), {fmt['dd_mm_yyyy']} DD-MM-YYYY (01-01-2006), {fmt['other']} other - will auto-convert to MM-YYYY in Step 3")
+
+    # A missing To / YOE column counts as every row missing it
+    if na_counts["To"] > 0:
+        info_msgs.append(f"ℹ️ {na_counts['To']} rows have missing 'To' dates - will be set to 'Present' in Step 3")
+
+    if na_counts["Years of Experience"] > 0:
+        info_msgs.append(f"ℹ️ {na_counts['Years of Experience']} rows have missing 'Years of Experience' - will be auto-calculated in Step 3")
+
+    return issues, warnings, info_msgs
+
+def _render_messages(issues, warnings, info_msgs):
+    for issue in issues:
+        st.error(issue)
+    for warning in warnings:
+        st.warning(warning)
+    for info in info_msgs:
+        st.info(info)
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame (values, index, column names and dtypes), cheap enough to compute every rerun"""
+    h = hashlib.blake2b(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes(), digest_size=16)
+    h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+def autosave_personnel(df: pd.DataFrame) -> str:
+    """Write df to this session's temp Excel (created on first save); skipped when the content hasn't changed.
+    Returns df's frame_fingerprint."""
+    ss = st.session_state
+    digest = frame_fingerprint(df)
+    if ss.current_edit_path is not None and ss.last_saved_digest == digest:
+        return digest
+    if ss.current_edit_path is None:
+        ss.current_edit_path = save_temp_excel(df)  # timestamped
+    else:
+        save_temp_excel(df, fixed_path=ss.current_edit_path)
+    ss.last_saved_digest = digest
+    return digest
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def personnel_xlsx_bytes(fingerprint: str, _df: pd.DataFrame) -> bytes:
+    """Personnel_download.xlsx contents, built once per frame version (fingerprint is the cache key)"""
+    df_download = _df.copy()
+    # Remove Assigned Role if exists
+    if "Assigned Role" in df_download.columns:
+        df_download = df_download.drop(columns=["Assigned Role"])
+    # Ensure To is "Present" and YOE is integer
+    df_download["To"] = "Present"
+    if "Years of Experience" in df_download.columns:
+        df_download["Years of Experience"] = pd.to_numeric(df_download["Years of Experience"], errors="coerce").fillna(0).astype("int64")
+    buf = io.BytesIO()
+    df_download.to_excel(buf, index=False, engine=EXCEL_WRITE_ENGINE)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def validate_personnel(fingerprint: str, _df: pd.DataFrame) -> tuple[list[dict], list[dict]]:
+    """Step 3 download/generate checks as (critical errors, warnings), recomputed only when the frame changes"""
+    validation_errors = []
+    validation_warnings = []
+    df_validation = _df  # read-only, no copy needed
+    # Nothing to flag in an empty table
+    if df_validation.empty:
+        return validation_errors, validation_warnings
+    
+    # Helper function to flag empty / whitespace-only cells
+    def empty_mask(col):
+        # Text columns are already TEXT_DTYPE, so the cast is free and the strip runs in Arrow's string kernels
+        s = df_validation[col].astype(TEXT_DTYPE or "string").str.strip()
+        return (s.isna() | s.eq("")).to_numpy(dtype=bool)
+    
+    critical_fields = [
+        ("Name", "❌ Missing Names", "{} personnel have no name assigned"),
+        ("Job Title", "❌ Missing Job Titles", "{} personnel have no job title assigned"),
+        ("Qualification", "❌ Missing Qualifications", "{} personnel have no qualification assigned"),
+        ("From", "❌ Missing From Dates", "{} personnel have no 'From' date (Years of Experience will be 0)"),
+    ]
+    empty_masks = {field: empty_mask(field) for field, _, _ in critical_fields if field in df_validation.columns}
+    
+    # Name or row number for every row, built once for all the affected-row lists
+    row_ids = "Row " + pd.Series(df_validation.index + 1, index=df_validation.index).astype(str)
+    if "Name" in empty_masks:
+        row_ids = row_ids.where(empty_masks["Name"], row_ids + ": " + df_validation["Name"].astype(str))
+    
+    # Positions of the first 10 flagged rows, without building the filtered frame
+    def first_rows(mask):
+        return np.flatnonzero(mask)[:10]
+    
+    # Check for empty Names, Job Titles, Qualifications and From dates - CRITICAL
+    for field, title, message in critical_fields:
+        if field in empty_masks:
+            empty = empty_masks[field]
+            empty_count = int(empty.sum())
+            if empty_count:
+                validation_errors.append({
+                    "title": title,
+                    "count": empty_count,
+                    "details": row_ids.iloc[first_rows(empty)].tolist(),
+                    "message": message.format(empty_count)
+                })
+    
+    # Check for invalid From date format - WARNING
+    if "From" in df_validation.columns:
+        from_vals = df_validation["From"]
+        from_str = from_vals.astype(object).astype(str).str.strip()
+        # Anything that isn't MM-YYYY must at least parse as a date
+        candidates = (from_vals.notna() & from_str.ne("") & ~from_str.str.match(MM_YYYY_RE)).to_numpy(dtype=bool)
+        invalid = np.zeros(len(df_validation), dtype=bool)
+        invalid[candidates] = unparsable_dates(from_vals[candidates])
+        invalid_count = int(invalid.sum())
+        
+        if invalid_count:
+            top = first_rows(invalid)
+            details = [f"{rid} - '{val}'" for rid, val in zip(row_ids.iloc[top], from_str.iloc[top])]
+            validation_warnings.append({
+                "title": "⚠️ Invalid From Date Format",
+                "count": invalid_count,
+                "details": details,
+                "message": f"{invalid_count} personnel have 'From' dates in unsupported format (use MM-YYYY like 01-2020)"
+            })
+    
+    # Check for Zero Years of Experience - WARNING
+    if "Years of Experience" in df_validation.columns:
+        ys = df_validation["Years of Experience"]
+        # After YOE recalculation the column is plain int64, so compare the array directly
+        if pd.api.types.is_numeric_dtype(ys) and not ys.hasnans:
+            zero_yoe = ys.to_numpy() == 0
+        else:
+            zero_yoe = (ys.fillna(0) == 0).to_numpy(dtype=bool)
+        zero_count = int(zero_yoe.sum())
+        if zero_count:
+            validation_warnings.append({
+                "title": "⚠️ Zero Years of Experience",
+                "count": zero_count,
+                "details": row_ids.iloc[first_rows(zero_yoe)].tolist(),
+                "message": f"{zero_count} personnel have 0 years of experience (may need 'From' date correction)"
+            })
+    
+    return validation_errors, validation_warnings
+
+@functools.lru_cache(maxsize=1)
+def base_column_config() -> dict:
+    """Step 3 data_editor column config shared by both Job Title modes (Job Title as free text)"""
+    return {
+        "Select": st.column_config.CheckboxColumn("Select", default=False, width="small"),
+        "Name": st.column_config.TextColumn("Name", width="medium", required=True),
+        "Qualification": st.column_config.TextColumn("Qualification", width="medium", required=True),
+        "Job Title": st.column_config.TextColumn("Job Title", width="medium", required=True),
+        "From": st.column_config.TextColumn("From (MM-YYYY)", width="small", required=True, help="Format: MM-YYYY (e.g., 01-2020)"),
+        "To": st.column_config.TextColumn("To", width="small"),
+        "Years of Experience": st.column_config.NumberColumn("YOE (Years)", width="small", format="%d"),
+    }
+
+@functools.lru_cache(maxsize=16)
+def grid_column_config(assign_roles: bool, roles: tuple[str, ...]) -> dict:
+    """Step 3 data_editor column config; Job Title is a selectbox over roles when assigning roles.
+    Shared between reruns (st.data_editor deep-copies it)."""
+    if not assign_roles:
+        return base_column_config()
+    return {
+        **base_column_config(),
+        "Job Title": st.column_config.SelectboxColumn(
+            "Job Title",
+            width="medium",
+            options=list(roles),
+            required=True,
+            help="Select from defined roles"
+        ),
+    }
+
+@functools.lru_cache(maxsize=16)
+def job_title_choices(roles: tuple[str, ...]) -> list[str]:
+    """Defined roles plus the 'Custom' escape hatch, for the Add User and bulk Job Title selectboxes"""
+    return list(roles) + ["Custom"]
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def preprocess_step3(fingerprint: str, today: date, _df: pd.DataFrame) -> tuple[pd.DataFrame, dict, dict[str, int]]:
+    """Step 3 normalisation of the personnel frame (From/To to MM-YYYY), a report of the From conversions
+    (counts plus the first few messages) and per-column missing counts.
+    Keyed on frame_fingerprint(_df), so reruns with unchanged data skip the work."""
+    df_work = _df.copy()
+    default_to = f"{today.month:02d}-{today.year}"
+
+    # Analyze "From" column for various formats
+    from_report = {"issue_count": 0, "issues": [], "converted_count": 0, "converted": []}
+
+    if "From" in df_work.columns:
+        # One column-wide conversion; the per-row messages are only built for rows that need one
+        from_col = df_work["From"]
+        from_mm_yyyy = convert_to_mm_yyyy_series(from_col)
+        original = from_col.astype(str).str.strip()
+        present = (from_col.notna() & original.ne("")).to_numpy(dtype=bool)
+        unconvertible = present & from_mm_yyyy.eq("").to_numpy(dtype=bool)
+        changed = present & ~unconvertible & from_mm_yyyy.ne(original).to_numpy(dtype=bool)
+        issue_rows = np.flatnonzero(unconvertible)
+        changed_rows = np.flatnonzero(changed)
+        from_report["issue_count"] = len(issue_rows)
+        from_report["issues"] = [
+            f"Row {i + 1}: '{str(from_col.iat[i]).strip()}' - unsupported format"
+            for i in issue_rows[:MESSAGE_PREVIEW_ROWS]
+        ]
+        from_report["converted_count"] = len(changed_rows)
+        from_report["converted"] = [
+            f"Row {i + 1}: '{str(from_col.iat[i]).strip()}' → '{from_mm_yyyy.iat[i]}'"
+            for i in changed_rows[:MESSAGE_PREVIEW_ROWS]
+        ]
+
+    # Ensure "To" column exists and is formatted
+    if "To" not in df_work.columns:
+        df_work["To"] = default_to
+    else:
+        # 'To' holds few distinct values ("Present", a handful of months), so only those are converted
+        to_col = df_work["To"]
+        to_filled = (to_col.notna() & to_col.astype(str).str.strip().ne("")).to_numpy(dtype=bool)
+        codes, uniques = pd.factorize(to_col[to_filled])
+        to_out = np.full(len(to_col), default_to, dtype=object)
+        to_out[to_filled] = convert_to_mm_yyyy_series(pd.Series(uniques)).to_numpy()[codes]
+        df_work["To"] = pd.Series(to_out, index=to_col.index, dtype=object)
+
+    # Apply conversions to "From" column (unsupported formats become empty)
+    if "From" in df_work.columns:
+        df_work["From"] = from_mm_yyyy
+
+    # Missing required fields: the text columns in one blank-mask reduction; converted From values are
+    # already stripped ('' when blank or unsupported), so From needs no second strip
+    sub = df_work[[c for c in ["Name", "Job Title", "Qualification"] if c in df_work.columns]]
+    blank = sub.isna() | sub.astype(str).apply(lambda c: c.str.strip()).eq("")
+    missing_counts = {col: int(n) for col, n in blank.sum().items()}
+    if "From" in df_work.columns:
+        missing_counts["From"] = int(from_mm_yyyy.eq("").sum())
+
+    # Converted From/To come back as object columns; keep them Arrow-backed like the rest of the text
+    return downcast_text_columns(df_work), from_report, missing_counts
+
 # =========================
 # AUTO-LOAD FILES
 # =========================
+@st.cache_data(show_spinner=False)
+def read_personnel_file(path: str, mtime: float) -> pd.DataFrame:
+    """Read the personnel workbook (mtime is only part of the cache key, so edits on disk are picked up)"""
+    return pd.read_excel(path, engine=EXCEL_READ_ENGINE)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def read_project_info_file(path: str, mtime: float, sheet_name: str) -> pd.DataFrame | None:
+    """Read the project_info sheet, or None if the workbook doesn't have it (one read-only frame shared by all sessions)"""
+    # Closed as soon as the sheet is read, so the workbook isn't held open (and locked on Windows)
+    with pd.ExcelFile(path, engine=EXCEL_READ_ENGINE) as xls:
+        if sheet_name not in xls.sheet_names:
+            return None
+        return pd.read_excel(xls, sheet_name=sheet_name)
+
+@st.cache_data(show_spinner=False)
+def list_excel_sheets(file_bytes: bytes) -> list[str]:
+    """Sheet names of an uploaded workbook (read-only open, no sheet data is parsed)"""
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+@st.cache_data(show_spinner=False)
+def read_excel_sheet(file_bytes: bytes, sheet_name: str) -> pd.DataFrame:
+    """Read one sheet of an uploaded workbook (cached on the file contents, so reruns skip the parse)"""
+    return pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_name, engine=EXCEL_READ_ENGINE)
+
+@st.cache_data(show_spinner="Preparing personnel…")
+def prepare_personnel(source_key: str, sheet: str, today: date, _raw: pd.DataFrame) -> pd.DataFrame:
+    """Add required columns and recalculate integer YOE; cached per source file, sheet and day (YOE depends on today)"""
+    dfp = downcast_text_columns(ensure_required_cols(_raw))
+    dfp = recalc_yoe_for_from_column(dfp, today)
+    # Ensure YOE is integer
+    if "Years of Experience" in dfp.columns:
+        dfp["Years of Experience"] = pd.to_numeric(dfp["Years of Experience"], errors="coerce").fillna(0).astype("int64")
+    return dfp
+
 def auto_load_files():
     """Auto-load personnel and project_info files on first run"""
     if st.session_state.files_loaded:
@@ -239,12 +891,9 @@ def auto_load_files():
     # Load Personnel file
     if os.path.exists(PERSONNEL_PATH):
         try:
-            dfp = pd.read_excel(PERSONNEL_PATH)
-            dfp = ensure_required_cols(dfp)
-            dfp = recalc_yoe_for_from_column(dfp)
-            # Ensure YOE is integer
-            if "Years of Experience" in dfp.columns:
-                dfp["Years of Experience"] = dfp["Years of Experience"].apply(lambda x: int(float(x)) if pd.notna(x) else 0)
+            mtime = os.path.getmtime(PERSONNEL_PATH)
+            dfp = read_personnel_file(PERSONNEL_PATH, mtime)
+            dfp = prepare_personnel(f"{PERSONNEL_PATH}@{mtime}", "", date.today(), dfp)
             st.session_state.df_personnel = dfp
             st.session_state.personnel_load_status = f"✅ Loaded successfully: {len(dfp)} rows"
         except Exception as e:
@@ -255,9 +904,8 @@ def auto_load_files():
     # Load Project Info file
     if os.path.exists(PROJECT_WB_PATH):
         try:
-            xls = pd.ExcelFile(PROJECT_WB_PATH)
-            if PROJECT_INFO_SHEET in xls.sheet_names:
-                dfproj = pd.read_excel(xls, sheet_name=PROJECT_INFO_SHEET)
+            dfproj = read_project_info_file(PROJECT_WB_PATH, os.path.getmtime(PROJECT_WB_PATH), PROJECT_INFO_SHEET)
+            if dfproj is not None:
                 st.session_state.df_project_info = dfproj
                 st.session_state.project_load_status = f"✅ Loaded successfully: {len(dfproj)} rows"
             else:
@@ -281,6 +929,28 @@ FONT_NAME = "Times New Roman"
 FONT_SIZE = 8
 LINE_SPACING = 1.15
 INDENT_CM = 0.12
+CV_TEMPLATE_PATH = os.path.join("template", "CV_template.docx")
+
+# Table 1 rows as (text, bold); {placeholders} are filled per employee
+CV_TABLE1_ROWS = (
+    ("Position: {job_title}", False),
+    ("Name of Bidder: Pioneer Foundation Engineers Private Limited", False),
+    ("Position: {job_title}", False),
+    ("Personnel Information", True),
+    ("Name: {name}", False),
+    ("Qualification / Certification / Licence / Training: {qualification}", False),
+    ("Present Employment", True),
+    ("Name of Employer: Pioneer Foundation Engineers Private Limited", False),
+    ("Address of Employer: Boomerang, B-2, 508/509, Off Chandivali Farm Rd, Chandivali, Powai, Mumbai, Maharashtra 400072", False),
+    ("Telephone: 022 4801 1311", False),
+    ("Contact (Manager / Personnel Officer): +91 99209 03578", False),
+    ("Fax: –", False),
+    ("E-mail: sales@pfepl.com", False),
+    ("Job Title: {job_title}", False),
+    ("Years with Present Employer: {yoe}", False),
+    ("Mobile: +91 99209 03578", False),
+    ("Professional Experience (Last 10 Years)", True),
+)
 
 def to_dt_floor_month(val):
     """Convert any date value to a date object (first day of month), stripping time component"""
@@ -306,7 +976,7 @@ def to_dt_floor_month(val):
         return date(int(s), 1, 1)
 
     # Handle MM-YYYY or MM/YYYY format
-    mm_yyyy_match = re.match(r'^(\d{1,2})[-/](\d{4})$', s)
+    mm_yyyy_match = MM_YYYY_RE.match(s)
     if mm_yyyy_match:
         mm = int(mm_yyyy_match.group(1))
         yyyy = int(mm_yyyy_match.group(2))
@@ -320,6 +990,37 @@ def to_dt_floor_month(val):
     except Exception:
         return None
 
+def floor_month_series(series: pd.Series) -> pd.Series:
+    """Column-wide to_dt_floor_month: month-start timestamps, NaT where a value can't be parsed"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.to_period("M").dt.to_timestamp()
+
+    # Work positionally so duplicate index labels can't cross-assign
+    values = series.reset_index(drop=True)
+    s = values[values.notna()].astype(str).str.strip()
+    out = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+
+    # Handle "Present" text
+    present = s.str.lower().str.contains("present", regex=False)
+    today = date.today()
+    out.loc[present[present].index] = pd.Timestamp(today.year, today.month, 1)
+
+    # Handle year-only and MM-YYYY / MM/YYYY formats
+    # (DD-MM-YYYY isn't special-cased here, those go through the general parse)
+    m = s.str.extract(DATE_RE).astype("float64")
+    year = m["yyyy"].fillna(m["year"])
+    month = m["mm"].mask(m["year"].notna(), 1.0)
+    matched = year.notna() & ~present
+    parts = pd.DataFrame({"year": year[matched], "month": month[matched].clip(1, 12), "day": 1})
+    out.loc[parts.index] = pd.to_datetime(parts, errors="coerce")
+
+    # Try general date parsing
+    rest = s[~(matched | present)]
+    if not rest.empty:
+        parsed = pd.to_datetime(rest, errors="coerce", format="mixed")
+        out.loc[rest.index] = parsed.dt.to_period("M").dt.to_timestamp()
+    return out.set_axis(series.index)
+
 def format_mm_yyyy(val, allow_present=False):
     """Format any date value to MM-YYYY format for display in Word"""
     if pd.isna(val) or val is None:
@@ -339,8 +1040,9 @@ def format_mm_yyyy(val, allow_present=False):
         return f"01-{s}"
 
     # Handle MM-YYYY or similar formats already
-    if re.match(r'^\d{1,2}[-/]\d{4}$', s):
-        parts = re.split(r'[-/]', s)
+    mm_yyyy_match = MM_YYYY_RE.match(s)
+    if mm_yyyy_match:
+        parts = mm_yyyy_match.groups()
         mm = parts[0].zfill(2)  # Ensure 2-digit month
         yyyy = parts[1]
         return f"{mm}-{yyyy}"
@@ -359,6 +1061,11 @@ def bulletize(text):
         return ""
     # Convert en-dash to regular dash
     text = text.replace("\u2013", "-").strip()
+    # Single item (no "--" separators): skip the split below
+    if "--" not in text:
+        if not text:
+            return ""
+        return text if text.startswith("-") else "- " + text
     # Remove leading/trailing double dashes specifically
     while text.startswith("--"):
         text = text[2:].strip()
@@ -398,15 +1105,8 @@ def add_row(table, text, bold=False):
     cell = table.add_row().cells[0]
     write_cell(cell, text, bold=bold)
 
-def set_table_borders(table):
-    """Set black borders for all cells in a table"""
-    tbl = table._element
-    tblPr = tbl.tblPr
-    if tblPr is None:
-        tblPr = OxmlElement('w:tblPr')
-        tbl.insert(0, tblPr)
-    
-    # Create table borders element
+def _build_table_borders():
+    """Build the black single-line tblBorders element shared by all CV tables"""
     tblBorders = OxmlElement('w:tblBorders')
     for border_name in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
         border = OxmlElement(f'w:{border_name}')
@@ -415,14 +1115,96 @@ def set_table_borders(table):
         border.set(qn('w:space'), '0')
         border.set(qn('w:color'), '000000')  # Black color
         tblBorders.append(border)
+    return tblBorders
+
+TABLE_BORDERS = _build_table_borders()  # built once, deep-copied into each table
+
+def set_table_borders(table):
+    """Set black borders for all cells in a table"""
+    tbl = table._element
+    tblPr = tbl.tblPr
+    if tblPr is None:
+        tblPr = OxmlElement('w:tblPr')
+        tbl.insert(0, tblPr)
     
-    tblPr.append(tblBorders)
+    tblPr.append(copy.deepcopy(TABLE_BORDERS))
+
+def build_one_cv(emp, chosen, template_bytes):
+    """Build one employee's CV from the template; returns the in-memory Document"""
+    # Load a fresh copy of the template for each employee
+    doc = Document(io.BytesIO(template_bytes))
+
+    # TABLE 1 – Personal Info
+    table1 = doc.add_table(rows=0, cols=1)
+    try:
+        table1.style = "Table Grid"
+    except KeyError:
+        pass  # Style doesn't exist in template, use default
+    set_table_borders(table1)
+
+    fields = {
+        "job_title": getattr(emp, "Job_Title", ""),
+        "name": getattr(emp, "Name", ""),
+        "qualification": getattr(emp, "Qualification", ""),
+        "yoe": getattr(emp, "Years_of_Experience", ""),
+    }
+    for text, bold in CV_TABLE1_ROWS:
+        add_row(table1, text.format_map(fields), bold=bold)
+
+    gap_p = doc.add_paragraph("")
+    gap_p.paragraph_format.space_before = Pt(0)
+    gap_p.paragraph_format.space_after = Pt(2)
+
+    # TABLE 2 – Experience Details (ONE project, random from eligible)
+    table2 = doc.add_table(rows=1, cols=4)
+    try:
+        table2.style = "Table Grid"
+    except KeyError:
+        pass  # Style doesn't exist in template, use default
+    set_table_borders(table2)
+
+    hdr = table2.rows[0].cells
+    write_cell(hdr[0], "From (MM-YYYY)", bold=True)
+    write_cell(hdr[1], "To (MM-YYYY)", bold=True)
+    write_cell(hdr[2], "Company / Project / Position", bold=True)
+    write_cell(hdr[3], "Relevant Technical & Managerial Experience", bold=True)
+
+    row = table2.add_row().cells
+
+    # Use EMPLOYEE's From date (not project dates) in either branch
+    from_disp = format_mm_yyyy(getattr(emp, "From", None))
+
+    # Fill the experience row
+    if chosen is not None:
+        to_disp   = "Present"  # Always show Present for To
+        
+        # Use project's description
+        cpp  = chosen.get("proj_cpp", "")
+        desc = bulletize(chosen.get("proj_desc", ""))
+
+        write_cell(row[0], from_disp)
+        write_cell(row[1], to_disp)
+        write_cell(row[2], str(cpp))
+        write_cell(row[3], desc)
+    else:
+        # No eligible project found - use employee info only
+        write_cell(row[0], from_disp)
+        write_cell(row[1], "Present")
+        write_cell(row[2], f"Pioneer Foundation Engineers Pvt. Ltd. / {getattr(emp, 'Job_Title', '')}")
+        write_cell(row[3], "")
 
-def run_bulk_generator(personnel_df: pd.DataFrame, project_info_df: pd.DataFrame | None, out_docx: str):
-    import random as _random
+    # Add page break after each CV (except the last one will be handled by merge)
+    doc.add_page_break()
+    return doc
+
+def run_bulk_generator(personnel_df: pd.DataFrame, project_info_df: pd.DataFrame | None, out_docx: str | io.BytesIO):
     from docxcompose.composer import Composer
     df = personnel_df.copy()
 
+    # Read the template once; each CV is parsed from these in-memory bytes
+    with open(CV_TEMPLATE_PATH, "rb") as f:
+        template_bytes = f.read()
+
     projects = pd.DataFrame()
     if project_info_df is not None and not project_info_df.empty:
         projects = project_info_df.rename(columns={
@@ -431,168 +1213,85 @@ def run_bulk_generator(personnel_df: pd.DataFrame, project_info_df: pd.DataFrame
             "Company / Project / Position": "proj_cpp",
             "Relevant Technical & Managerial Experience": "proj_desc",
         }).copy()
-        projects["proj_start_dt"] = projects["proj_start"].apply(to_dt_floor_month)
-        projects["proj_end_dt"]   = projects["proj_end"].apply(to_dt_floor_month)
+        proj_start_dt = floor_month_series(projects["proj_start"])
+        proj_end_dt   = floor_month_series(projects["proj_end"])
+        # Skip projects with both dates missing; missing end = ongoing, missing start = open-ended
+        has_dates = proj_start_dt.notna() | proj_end_dt.notna()
+        today = date.today()
+        projects = projects.loc[has_dates].assign(
+            proj_start_dt=proj_start_dt[has_dates].fillna(pd.Timestamp(1900, 1, 1)),
+            proj_end_dt=proj_end_dt[has_dates].fillna(pd.Timestamp(today.year, today.month, 1)),
+        )
 
-    # Track used projects to avoid duplicates
-    used_project_indices = set()
-    
-    # Create list to store individual CV documents
-    temp_docs = []
+    # Project timelines as datetime64 arrays for the per-employee overlap check
+    if not projects.empty:
+        proj_start_arr = projects["proj_start_dt"].to_numpy(dtype="datetime64[ns]")
+        proj_end_arr = projects["proj_end_dt"].to_numpy(dtype="datetime64[ns]")
 
-    for i, emp in df.iterrows():
-        # Load a fresh copy of the template for each employee
-        doc = Document('template/CV_template.docx')
+    # Track used projects (by position) to avoid duplicates
+    used_mask = np.zeros(len(projects), dtype=bool)
+
+    # Attribute-friendly column names for itertuples
+    df_iter = df.rename(columns={
+        "Job Title": "Job_Title",
+        "Years of Experience": "Years_of_Experience",
+        "Assigned Role": "Assigned_Role",
+    })
+
+    # Pick every employee's project up front, then build the CVs from those choices
+    jobs = []
+    for emp in df_iter.itertuples(index=False, name="Emp"):
         # Parse employee dates from personnel data
-        emp_start_dt = to_dt_floor_month(emp.get("From"))
-        emp_end_dt   = to_dt_floor_month(emp.get("To")) if "To" in df.columns else None
+        emp_start_dt = to_dt_floor_month(getattr(emp, "From", None))
+        emp_end_dt   = to_dt_floor_month(getattr(emp, "To", None)) if "To" in df.columns else None
         
         # If To is not set or is "Present", use current date
-        if emp_end_dt is None or str(emp.get("To", "")).lower() == "present":
+        if emp_end_dt is None or str(getattr(emp, "To", "")).lower() == "present":
             today = date.today()
             emp_end_dt = date(today.year, today.month, 1)
 
-        # TABLE 1 – Personal Info
-        table1 = doc.add_table(rows=0, cols=1)
-        try:
-            table1.style = "Table Grid"
-        except KeyError:
-            pass  # Style doesn't exist in template, use default
-        set_table_borders(table1)
-
-        add_row(table1, f"Position: {emp.get('Job Title','')}")
-        add_row(table1, "Name of Bidder: Pioneer Foundation Engineers Private Limited")
-        add_row(table1, f"Position: {emp.get('Job Title','')}")
-        add_row(table1, "Personnel Information", bold=True)
-        add_row(table1, f"Name: {emp.get('Name','')}")
-        add_row(table1, f"Qualification / Certification / Licence / Training: {emp.get('Qualification','')}")
-        add_row(table1, "Present Employment", bold=True)
-        add_row(table1, "Name of Employer: Pioneer Foundation Engineers Private Limited")
-        add_row(table1, "Address of Employer: Boomerang, B-2, 508/509, Off Chandivali Farm Rd, Chandivali, Powai, Mumbai, Maharashtra 400072")
-        add_row(table1, "Telephone: 022 4801 1311")
-        add_row(table1, "Contact (Manager / Personnel Officer): +91 99209 03578")
-        add_row(table1, "Fax: –")
-        add_row(table1, "E-mail: sales@pfepl.com")
-        add_row(table1, f"Job Title: {emp.get('Job Title','')}")
-        add_row(table1, f"Years with Present Employer: {emp.get('Years of Experience','')}")
-        add_row(table1, "Mobile: +91 99209 03578")
-        add_row(table1, "Professional Experience (Last 10 Years)", bold=True)
-
-        gap_p = doc.add_paragraph("")
-        gap_p.paragraph_format.space_before = Pt(0)
-        gap_p.paragraph_format.space_after = Pt(2)
-
-        # TABLE 2 – Experience Details (ONE project, random from eligible)
-        table2 = doc.add_table(rows=1, cols=4)
-        try:
-            table2.style = "Table Grid"
-        except KeyError:
-            pass  # Style doesn't exist in template, use default
-        set_table_borders(table2)
-
-        hdr = table2.rows[0].cells
-        write_cell(hdr[0], "From (MM-YYYY)", bold=True)
-        write_cell(hdr[1], "To (MM-YYYY)", bold=True)
-        write_cell(hdr[2], "Company / Project / Position", bold=True)
-        write_cell(hdr[3], "Relevant Technical & Managerial Experience", bold=True)
-
-        row = table2.add_row().cells
         chosen = None
         chosen_idx = None
 
         # Find eligible projects based on timeline overlap
         if not projects.empty:
-            eligible = []
-            for proj_idx, p in projects.iterrows():
-                ps = p.get("proj_start_dt")  # Project start date
-                pe = p.get("proj_end_dt")    # Project end date
-                
-                # Skip if both dates are missing
-                if ps is None and pe is None:
-                    continue
-                
-                # Handle missing project end date (ongoing project)
-                if pe is None:
-                    today = date.today()
-                    pe = date(today.year, today.month, 1)
-                
-                # Handle missing project start date
-                if ps is None:
-                    ps = date(1900, 1, 1)
-                
-                # Check if project overlaps with employee tenure
-                # Project is eligible if:
-                # 1. Project ended AFTER employee started (pe >= emp_start_dt)
-                # 2. Project started BEFORE employee ended (ps <= emp_end_dt)
-                overlap = True
-                if emp_start_dt and pe < emp_start_dt:
-                    # Project completed before employee joined - NOT eligible
-                    overlap = False
-                if emp_end_dt and ps > emp_end_dt:
-                    # Project started after employee left - NOT eligible
-                    overlap = False
-                
-                if overlap:
-                    eligible.append((proj_idx, p))
+            # Project is eligible if:
+            # 1. Project ended AFTER employee started (pe >= emp_start_dt)
+            # 2. Project started BEFORE employee ended (ps <= emp_end_dt)
+            elig = proj_start_arr <= np.datetime64(emp_end_dt)
+            if emp_start_dt:
+                elig &= proj_end_arr >= np.datetime64(emp_start_dt)
+            elig_idx = np.flatnonzero(elig)
             
             # Try to pick an unused project first
-            unused_eligible = [(idx, p) for idx, p in eligible if idx not in used_project_indices]
+            unused_eligible = np.flatnonzero(elig & ~used_mask)
             
-            if unused_eligible:
+            if len(unused_eligible):
                 # Pick random from unused projects
-                chosen_idx, chosen = _random.choice(unused_eligible)
-                used_project_indices.add(chosen_idx)
-            elif eligible:
+                chosen_idx = random.choice(unused_eligible)
+                used_mask[chosen_idx] = True
+            elif len(elig_idx):
                 # All projects used, pick random from any eligible
-                chosen_idx, chosen = _random.choice(eligible)
-
-        # Fill the experience row
-        if chosen is not None:
-            # Use EMPLOYEE's From and To dates (not project dates)
-            from_disp = format_mm_yyyy(emp.get("From"))
-            to_disp   = "Present"  # Always show Present for To
-            
-            # Use project's description
-            cpp  = chosen.get("proj_cpp", "")
-            desc = bulletize(chosen.get("proj_desc", ""))
-
-            write_cell(row[0], from_disp)
-            write_cell(row[1], to_disp)
-            write_cell(row[2], str(cpp))
-            write_cell(row[3], desc)
-        else:
-            # No eligible project found - use employee info only
-            write_cell(row[0], format_mm_yyyy(emp.get("From")))
-            write_cell(row[1], "Present")
-            write_cell(row[2], f"Pioneer Foundation Engineers Pvt. Ltd. / {emp.get('Job Title','')}")
-            write_cell(row[3], "")
+                chosen_idx = random.choice(elig_idx)
+            if chosen_idx is not None:
+                chosen = projects.iloc[chosen_idx].to_dict()
 
-        # Add page break after each CV (except the last one will be handled by merge)
-        doc.add_page_break()
+        jobs.append((emp, chosen))
 
-        # Save this individual CV temporarily
-        temp_path = os.path.join(SAVE_DIR, f"temp_cv_{i}.docx")
-        doc.save(temp_path)
-        temp_docs.append(temp_path)
+    # Build the CVs in employee order
+    docs = [build_one_cv(emp, chosen, template_bytes) for emp, chosen in jobs]
 
     # Merge all individual CVs into one final document
-    if temp_docs:
+    if docs:
         # Start with the first document
-        master = Document(temp_docs[0])
-        composer = Composer(master)
+        composer = Composer(docs[0])
         
         # Append all other documents
-        for temp_doc_path in temp_docs[1:]:
-            doc_to_append = Document(temp_doc_path)
+        for doc_to_append in docs[1:]:
             composer.append(doc_to_append)
         
         # Save the final merged document
         composer.save(out_docx)
-        
-        # Clean up temporary files
-        for temp_path in temp_docs:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
 
 # =========================
 # AUTO-LOAD FILES ON STARTUP
@@ -626,7 +1325,10 @@ st.title("Key Personnel — Editor & Bulk CV Generator")
 # =========================
 # STEP 1 — REVIEW AUTO-LOADED FILES & UPLOAD
 # =========================
-if st.session_state.step == 1:
+# A fragment, so Step 1's own widgets (upload toggle, sheet picker) rerun only
+# this block; Reload / Confirm still trigger a full-app st.rerun()
+@st.fragment
+def render_step1():
     st.header("Step 1 — Data Preparation & Validation")
 
     st.info("📂 Files are automatically loaded from the system. You can also upload your own files for processing.")
@@ -646,6 +1348,7 @@ if st.session_state.step == 1:
             st.write(st.session_state.get("personnel_load_status", ""))
         with col2:
             if st.button("🔄 Reload Personnel", help="Reload the personnel file if you've made changes"):
+                # Always reset to the file on disk; the read and preparation are cached on (path, mtime)
                 st.session_state.files_loaded = False
                 st.session_state.files_confirmed = False
                 st.session_state.df_personnel = None
@@ -653,74 +1356,20 @@ if st.session_state.step == 1:
                 st.rerun()
 
         if st.session_state.df_personnel is not None:
-            # Validate and analyze the data
-            df_check = st.session_state.df_personnel.copy()
+            # Validate and analyze the data (read-only, so no copy needed)
+            df_check = st.session_state.df_personnel
             
             # Analysis
             with st.expander("📊 Data Analysis", expanded=False):
-                issues = []
-                warnings = []
-                info_msgs = []
-                
-                # Check for missing required columns
-                missing_cols = [col for col in REQUIRED_COLS if col not in df_check.columns]
-                if missing_cols:
-                    issues.append(f"❌ Missing required columns: {', '.join(missing_cols)}")
-                
-                # Check for missing values in key columns
-                if "Name" in df_check.columns:
-                    missing_names = df_check["Name"].isna().sum()
-                    if missing_names > 0:
-                        warnings.append(f"⚠️ {missing_names} rows have missing Names")
-                
-                if "From" in df_check.columns:
-                    missing_from = df_check["From"].isna().sum()
-                    if missing_from > 0:
-                        warnings.append(f"⚠️ {missing_from} rows have missing 'From' dates - YOE will be 0")
-                    
-                    # Check for various date formats
-                    year_only = 0
-                    dd_mm_yyyy = 0
-                    other_formats = 0
-                    for val in df_check["From"].dropna():
-                        if pd.notna(val):
-                            s = str(val).strip()
-                            if s.isdigit() and len(s) == 4:
-                                year_only += 1
-                            elif re.match(r"^\d{1,2}[-/]\d{1,2}[-/]\d{4}$", s):
-                                dd_mm_yyyy += 1
-                            elif not re.match(r"^\d{1,2}[-/]\d{4}$", s) and not isinstance(val, (datetime, pd.Timestamp, date)):
-                                other_formats += 1
-                    
-                    if year_only > 0 or dd_mm_yyyy > 0 or other_formats > 0:
-                        info_msgs.append(f"ℹ️ Date formats detected: {year_only} year-only (2017), {dd_mm_yyyy} DD-MM-YYYY (01-01-2006), {other_formats} other - will auto-convert to MM-YYYY in Step 3")
-                
-                if "To" in df_check.columns:
-                    missing_to = df_check["To"].isna().sum()
-                    if missing_to > 0:
-                        st.info(f"ℹ️ {missing_to} rows have missing 'To' dates - will be set to 'Present' in Step 3")
-                
-                if "Years of Experience" in df_check.columns:
-                    missing_yoe = df_check["Years of Experience"].isna().sum()
-                    if missing_yoe > 0:
-                        st.info(f"ℹ️ {missing_yoe} rows have missing 'Years of Experience' - will be auto-calculated in Step 3")
-                
-                if issues:
-                    for issue in issues:
-                        st.error(issue)
-                if warnings:
-                    for warning in warnings:
-                        st.warning(warning)
-                if info_msgs:
-                    for info in info_msgs:
-                        st.info(info)
+                issues, warnings, info_msgs = analyze_personnel(df_check)
+                _render_messages(issues, warnings, info_msgs)
                 
                 if not issues and not warnings:
                     st.success("✅ All data looks good!")
                 
                 st.caption(f"📈 Total rows: {len(df_check)} | Columns: {len(df_check.columns)}")
             
-            st.dataframe(st.session_state.df_personnel, use_container_width=True, height=300)
+            st.dataframe(st.session_state.df_personnel.head(PREVIEW_ROWS), use_container_width=True, height=300)
             st.caption(f"Total rows: {len(st.session_state.df_personnel)}")
         else:
             st.warning("Personnel file could not be loaded. Please check the file path and try reloading.")
@@ -734,7 +1383,7 @@ if st.session_state.step == 1:
         st.write(st.session_state.get("project_load_status", ""))
 
         if st.session_state.df_project_info is not None:
-            st.dataframe(st.session_state.df_project_info, use_container_width=True, height=300)
+            st.dataframe(st.session_state.df_project_info.head(PREVIEW_ROWS), use_container_width=True, height=300)
             st.caption(f"Total rows: {len(st.session_state.df_project_info)}")
         else:
             st.warning("Project info file could not be loaded. Please check the file path.")
@@ -751,8 +1400,8 @@ if st.session_state.step == 1:
         if up_personnel_file is not None:
             try:
                 # Read all sheets
-                xls_personnel = pd.ExcelFile(up_personnel_file)
-                sheet_names = xls_personnel.sheet_names
+                personnel_bytes = up_personnel_file.getvalue()
+                sheet_names = list_excel_sheets(personnel_bytes)
                 
                 st.success(f"✅ File uploaded: {up_personnel_file.name}")
                 st.info(f"📑 Available sheets: {', '.join(sheet_names)}")
@@ -766,77 +1415,26 @@ if st.session_state.step == 1:
                 )
                 
                 if selected_personnel_sheet:
-                    dfp = pd.read_excel(xls_personnel, sheet_name=selected_personnel_sheet)
+                    dfp = read_excel_sheet(personnel_bytes, selected_personnel_sheet)
                     
                     # Validation and Analysis
                     st.markdown("##### 📊 Data Validation & Analysis")
                     
-                    issues = []
-                    warnings = []
-                    info_msgs = []
-                    
-                    # Check for required columns
-                    missing_cols = [col for col in REQUIRED_COLS if col not in dfp.columns]
-                    if missing_cols:
-                        issues.append(f"❌ Missing required columns: {', '.join(missing_cols)}")
-                    
-                    # Check data quality
-                    if "Name" in dfp.columns:
-                        missing_names = dfp["Name"].isna().sum()
-                        if missing_names > 0:
-                            warnings.append(f"⚠️ {missing_names} rows have missing Names")
-                    
-                    if "From" in dfp.columns:
-                        missing_from = dfp["From"].isna().sum()
-                        if missing_from > 0:
-                            info_msgs.append(f"ℹ️ {missing_from} rows have missing 'From' dates - will default to 0 YOE")
-                        
-                        # Check for various date formats
-                        year_only = 0
-                        dd_mm_yyyy = 0
-                        other_formats = 0
-                        for val in dfp["From"].dropna():
-                            if pd.notna(val):
-                                s = str(val).strip()
-                                if s.isdigit() and len(s) == 4:
-                                    year_only += 1
-                                elif re.match(r"^\d{1,2}[-/]\d{1,2}[-/]\d{4}$", s):
-                                    dd_mm_yyyy += 1
-                                elif not re.match(r"^\d{1,2}[-/]\d{4}$", s) and not isinstance(val, (datetime, pd.Timestamp, date)):
-                                    other_formats += 1
-                        
-                        if year_only > 0 or dd_mm_yyyy > 0 or other_formats > 0:
-                            info_msgs.append(f"ℹ️ Date formats detected: {year_only} year-only (2017), {dd_mm_yyyy} DD-MM-YYYY (01-01-2006), {other_formats} other - will auto-convert to MM-YYYY in Step 3")
-                    
-                    if "To" not in dfp.columns or dfp["To"].isna().all():
-                        info_msgs.append("ℹ️ 'To' column missing or empty - will be set to 'Present' in Step 3")
-                    
-                    if "Years of Experience" not in dfp.columns or dfp["Years of Experience"].isna().all():
-                        info_msgs.append("ℹ️ 'Years of Experience' missing - will be auto-calculated from 'From' date in Step 3")
-                    
-                    # Display validation results
-                    for issue in issues:
-                        st.error(issue)
-                    for warning in warnings:
-                        st.warning(warning)
-                    for info in info_msgs:
-                        st.info(info)
+                    issues, warnings, info_msgs = analyze_personnel(dfp)
+                    _render_messages(issues, warnings, info_msgs)
                     
                     if not issues:
                         st.success(f"✅ Data validation passed! Ready to process {len(dfp)} rows")
                         
                         # Process and store the data
-                        dfp = ensure_required_cols(dfp)
-                        dfp = recalc_yoe_for_from_column(dfp)
-                        # Ensure YOE is integer
-                        if "Years of Experience" in dfp.columns:
-                            dfp["Years of Experience"] = dfp["Years of Experience"].apply(lambda x: int(float(x)) if pd.notna(x) else 0)
+                        personnel_hash = hashlib.blake2b(personnel_bytes, digest_size=16).hexdigest()
+                        dfp = prepare_personnel(personnel_hash, selected_personnel_sheet, date.today(), dfp)
                         
                         st.session_state.df_personnel = dfp
                         st.session_state.current_edit_path = None
                         
                         # Show preview
-                        st.dataframe(dfp, use_container_width=True, height=300)
+                        st.dataframe(dfp.head(PREVIEW_ROWS), use_container_width=True, height=300)
                         st.caption(f"Total rows: {len(dfp)} | Columns: {len(dfp.columns)}")
                     else:
                         st.error("❌ Cannot proceed with this file. Please fix the issues above.")
@@ -856,7 +1454,7 @@ if st.session_state.step == 1:
         st.write(st.session_state.get("project_load_status", ""))
         
         if st.session_state.df_project_info is not None:
-            st.dataframe(st.session_state.df_project_info, use_container_width=True, height=300)
+            st.dataframe(st.session_state.df_project_info.head(PREVIEW_ROWS), use_container_width=True, height=300)
             st.caption(f"Total projects: {len(st.session_state.df_project_info)}")
         else:
             st.warning("Project info file could not be loaded from system.")
@@ -888,6 +1486,9 @@ if st.session_state.step == 1:
     else:
         st.error("⚠️ Cannot proceed. Please ensure both Personnel and Project Info files are loaded successfully.")
 
+if st.session_state.step == 1:
+    render_step1()
+
 # =========================
 # STEP 2 — ENHANCED ROLE DEFINITION & SEARCH
 # =========================
@@ -982,14 +1583,16 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                             "include_diploma": bool(include_diploma)
                         }
 
-                        # Upsert role
-                        found = False
-                        for i, rr in enumerate(st.session_state.roles):
-                            if rr["name"].lower() == name.lower():
-                                st.session_state.roles[i] = role_data
-                                found = True
-                                break
-                        if not found:
+                        # Upsert role (index rebuilt if it ever drifts from the list)
+                        roles_by_name = st.session_state.roles_by_name
+                        if len(roles_by_name) != len(st.session_state.roles):
+                            roles_by_name.clear()
+                            roles_by_name.update({rr["name"].lower(): i for i, rr in enumerate(st.session_state.roles)})
+                        idx = roles_by_name.get(name.lower())
+                        if idx is not None:
+                            st.session_state.roles[idx] = role_data
+                        else:
+                            roles_by_name[name.lower()] = len(st.session_state.roles)
                             st.session_state.roles.append(role_data)
 
                         st.success(f"✅ Role saved: {name}")
@@ -1001,6 +1604,7 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
         with colb2:
             if st.button("🗑️ Clear All Roles", use_container_width=True):
                 st.session_state.roles = []
+                st.session_state.roles_by_name = {}
                 st.success("All roles cleared.")
                 st.rerun()
 
@@ -1031,7 +1635,7 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                     st.error("❌ No personnel data found. Please load data in Step 1 first.")
                     st.stop()
                 
-                df = st.session_state.df_personnel.copy()
+                df = st.session_state.df_personnel
                 
                 # Verify required columns exist
                 required_search_cols = ["Name", "Qualification", "Job Title", "Years of Experience"]
@@ -1040,143 +1644,18 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                     st.error(f"❌ Required columns missing: {', '.join(missing_cols)}. Please check your data.")
                     st.stop()
                 
-                df["__yoe__"] = pd.to_numeric(df["Years of Experience"], errors="coerce").fillna(0.0)
-
                 summary_rows = []
+                role_results = search_roles(frame_fingerprint(df), st.session_state.roles, df)
 
-                for role in st.session_state.roles:
+                for role, (fully, title_qual_no_exp, qual_exp_no_title, qual_only, no_match) in zip(st.session_state.roles, role_results):
                     role_name = role["name"]
                     min_exp = float(role.get("min_exp", 0.0))
                     required = int(role["count"])
                     keywords = role.get("keywords", [])
                     search_mode = role.get("search_mode", "contains")
                     include_diploma = role.get("include_diploma", False)
-
-                    # Title matching
-                    title_hit = df["Job Title"].apply(lambda x: ci_contains(x, role_name))
-
-                    # Experience filter
-                    if min_exp > 0:
-                        exp_ok = df["__yoe__"] >= min_exp
-                    else:
-                        exp_ok = pd.Series([True] * len(df), index=df.index)
-
-                    # Qualification filter
-                    if keywords:
-                        if search_mode == "exact":
-                            # Exact word match (case-insensitive)
-                            # Matches "civil" in "B.E. Civil", "Civil Engineering", etc.
-                            def exact_match(qual_text):
-                                if pd.isna(qual_text):
-                                    return False
-                                # Split by common delimiters and clean up
-                                qual_lower = str(qual_text).lower()
-                                # Split by spaces, dots, commas, slashes, parentheses
-                                words = re.split(r'[\s\.\,\/\(\)\-]+', qual_lower)
-                                words = [w.strip() for w in words if w.strip()]
-                                # Check if any keyword matches any word exactly
-                                return any(kw in words for kw in keywords)
-
-                            qual_ok = df["Qualification"].apply(exact_match)
-                        else:
-                            # Contains: keyword found anywhere (substring match)
-                            def contains_match(qual_text):
-                                if pd.isna(qual_text):
-                                    return False
-                                qual_lower = str(qual_text).lower()
-                                return any(kw in qual_lower for kw in keywords)
-
-                            qual_ok = df["Qualification"].apply(contains_match)
-                    else:
-                        qual_ok = pd.Series([True] * len(df), index=df.index)
-
-                    # Diploma filter
-                    if include_diploma:
-                        # Include everyone (diploma or not)
-                        diploma_ok = pd.Series([True] * len(df), index=df.index)
-                    else:
-                        # Exclude diploma holders
-                        diploma_ok = ~df["Qualification"].apply(qualification_is_diploma)
-
-                    # Combined filters - Enhanced categorization
-                    # Adjust categorization based on which filters are actually active
                     has_qual_filter = bool(keywords)
                     has_exp_filter = min_exp > 0
-                    
-                    if has_qual_filter and has_exp_filter:
-                        # All filters active - full categorization
-                        # 1. Fully matched: Title + Experience + Qualification all match
-                        fully_mask = title_hit & exp_ok & qual_ok & diploma_ok
-                        
-                        # 2. Title + Qualification match, but Experience insufficient
-                        title_qual_no_exp_mask = title_hit & qual_ok & diploma_ok & (~exp_ok)
-                        
-                        # 3. Qualification + Experience match, but Title mismatch
-                        qual_exp_no_title_mask = (~title_hit) & exp_ok & qual_ok & diploma_ok
-                        
-                        # 4. Qualification only (no title, no experience)
-                        qual_only_mask = qual_ok & diploma_ok & (~exp_ok) & (~title_hit)
-                        
-                        # 5. No match at all
-                        no_match_mask = ~(fully_mask | title_qual_no_exp_mask | qual_exp_no_title_mask | qual_only_mask)
-                    
-                    elif has_qual_filter:
-                        # Only qualification filter active
-                        # 1. Fully matched: Title + Qualification match
-                        fully_mask = title_hit & qual_ok & diploma_ok
-                        
-                        # 2. Qualification only (no title match)
-                        qual_only_mask = (~title_hit) & qual_ok & diploma_ok
-                        
-                        # 3. No qualification match
-                        no_match_mask = ~qual_ok | ~diploma_ok
-                        
-                        # Not applicable
-                        title_qual_no_exp_mask = pd.Series([False] * len(df), index=df.index)
-                        qual_exp_no_title_mask = pd.Series([False] * len(df), index=df.index)
-                    
-                    elif has_exp_filter:
-                        # Only experience filter active
-                        # 1. Fully matched: Title + Experience match
-                        fully_mask = title_hit & exp_ok
-                        
-                        # 2. Experience but wrong title
-                        qual_exp_no_title_mask = (~title_hit) & exp_ok
-                        
-                        # 3. No experience match
-                        no_match_mask = ~exp_ok
-                        
-                        # Not applicable
-                        title_qual_no_exp_mask = pd.Series([False] * len(df), index=df.index)
-                        qual_only_mask = pd.Series([False] * len(df), index=df.index)
-                    
-                    else:
-                        # No filters - only title matching
-                        # 1. Fully matched: Title matches
-                        fully_mask = title_hit
-                        
-                        # 2. No title match
-                        no_match_mask = ~title_hit
-                        
-                        # Not applicable
-                        title_qual_no_exp_mask = pd.Series([False] * len(df), index=df.index)
-                        qual_exp_no_title_mask = pd.Series([False] * len(df), index=df.index)
-                        qual_only_mask = pd.Series([False] * len(df), index=df.index)
-
-                    # Extract results - just get the data, no formatting
-                    def safe_extract(mask, df):
-                        """Safely extract dataframe slice"""
-                        if mask.sum() == 0:
-                            return pd.DataFrame(columns=["Name", "Qualification", "Job Title", "From", "Years of Experience"])
-                        result = df[mask][["Name", "Qualification", "Job Title", "From", "Years of Experience"]].copy()
-                        result = result.reset_index(drop=True)
-                        return result
-
-                    fully = safe_extract(fully_mask, df)
-                    title_qual_no_exp = safe_extract(title_qual_no_exp_mask, df)
-                    qual_exp_no_title = safe_extract(qual_exp_no_title_mask, df)
-                    qual_only = safe_extract(qual_only_mask, df)
-                    no_match = safe_extract(no_match_mask, df)
 
                     missing = max(required - len(fully), 0)
                     
@@ -1265,14 +1744,12 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                         st.markdown("**✅ Fully Matched**")
                         if len(fully) > 0:
                             try:
-                                fully_display = fully.copy()
-                                for col in fully_display.columns:
-                                    fully_display[col] = fully_display[col].apply(lambda x: str(x) if pd.notna(x) else "")
+                                fully_display = display_frame(fully)
                                 st.dataframe(fully_display, use_container_width=True)
                             except Exception:
                                 st.warning("⚠️ Table display issue. Showing simplified view:")
-                                for idx, row in fully.iterrows():
-                                    st.text(f"• {row['Name']} - {row['Qualification']} - {row['Job Title']} - {row.get('From', '')} - {row['Years of Experience']} yrs")
+                                for name, qual, title, frm, yrs in fully.itertuples(index=False, name=None):
+                                    st.text(f"• {name} - {qual} - {title} - {frm} - {yrs} yrs")
                         else:
                             st.info("ℹ️ No fully matched candidates found.")
 
@@ -1280,37 +1757,31 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                         if has_qual_filter and has_exp_filter and len(title_qual_no_exp) > 0:
                             st.markdown("**⚠️ Title + Qualification Match (Experience Insufficient)**")
                             try:
-                                title_qual_display = title_qual_no_exp.copy()
-                                for col in title_qual_display.columns:
-                                    title_qual_display[col] = title_qual_display[col].apply(lambda x: str(x) if pd.notna(x) else "")
+                                title_qual_display = display_frame(title_qual_no_exp)
                                 st.dataframe(title_qual_display, use_container_width=True)
                                 st.caption("💡 These candidates have the right position and qualifications but need more experience.")
                             except Exception:
                                 st.warning("⚠️ Table display issue. Showing simplified view:")
-                                for idx, row in title_qual_no_exp.iterrows():
-                                    st.text(f"• {row['Name']} - {row['Qualification']} - {row['Job Title']} - {row.get('From', '')} - {row['Years of Experience']} yrs")
+                                for name, qual, title, frm, yrs in title_qual_no_exp.itertuples(index=False, name=None):
+                                    st.text(f"• {name} - {qual} - {title} - {frm} - {yrs} yrs")
 
                         # Show Qual+Exp (Wrong Title) only if both qual and exp filters are set
                         if has_qual_filter and has_exp_filter and len(qual_exp_no_title) > 0:
                             st.markdown("**🔍 Qualification + Experience Match (Title Mismatch)**")
                             try:
-                                qual_exp_display = qual_exp_no_title.copy()
-                                for col in qual_exp_display.columns:
-                                    qual_exp_display[col] = qual_exp_display[col].apply(lambda x: str(x) if pd.notna(x) else "")
+                                qual_exp_display = display_frame(qual_exp_no_title)
                                 st.dataframe(qual_exp_display, use_container_width=True)
                                 st.caption("💡 These candidates have the right qualifications and experience but different job title.")
                             except Exception:
                                 st.warning("⚠️ Table display issue. Showing simplified view:")
-                                for idx, row in qual_exp_no_title.iterrows():
-                                    st.text(f"• {row['Name']} - {row['Qualification']} - {row['Job Title']} - {row.get('From', '')} - {row['Years of Experience']} yrs")
+                                for name, qual, title, frm, yrs in qual_exp_no_title.itertuples(index=False, name=None):
+                                    st.text(f"• {name} - {qual} - {title} - {frm} - {yrs} yrs")
 
                         # Show Qualification Only if qual filter is set
                         if has_qual_filter and len(qual_only) > 0:
                             st.markdown("**📋 Qualification Only**")
                             try:
-                                qual_only_display = qual_only.copy()
-                                for col in qual_only_display.columns:
-                                    qual_only_display[col] = qual_only_display[col].apply(lambda x: str(x) if pd.notna(x) else "")
+                                qual_only_display = display_frame(qual_only)
                                 st.dataframe(qual_only_display, use_container_width=True)
                                 if has_exp_filter:
                                     st.caption("💡 These candidates have the right qualifications but title and/or experience don't match.")
@@ -1318,32 +1789,29 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
                                     st.caption("💡 These candidates have the right qualifications but title doesn't match.")
                             except Exception:
                                 st.warning("⚠️ Table display issue. Showing simplified view:")
-                                for idx, row in qual_only.iterrows():
-                                    st.text(f"• {row['Name']} - {row['Qualification']} - {row['Job Title']} - {row.get('From', '')} - {row['Years of Experience']} yrs")
+                                for name, qual, title, frm, yrs in qual_only.itertuples(index=False, name=None):
+                                    st.text(f"• {name} - {qual} - {title} - {frm} - {yrs} yrs")
                         
                         # Show Experience (No Title) if only exp filter is set
                         if has_exp_filter and not has_qual_filter and len(qual_exp_no_title) > 0:
                             st.markdown("**👤 Has Experience (Wrong Title)**")
                             try:
-                                exp_display = qual_exp_no_title.copy()
-                                for col in exp_display.columns:
-                                    exp_display[col] = exp_display[col].apply(lambda x: str(x) if pd.notna(x) else "")
+                                exp_display = display_frame(qual_exp_no_title)
                                 st.dataframe(exp_display, use_container_width=True)
                                 st.caption("💡 These candidates have the required experience but different job title.")
                             except Exception:
                                 st.warning("⚠️ Table display issue. Showing simplified view:")
-                                for idx, row in qual_exp_no_title.iterrows():
-                                    st.text(f"• {row['Name']} - {row['Qualification']} - {row['Job Title']} - {row.get('From', '')} - {row['Years of Experience']} yrs")
+                                for name, qual, title, frm, yrs in qual_exp_no_title.itertuples(index=False, name=None):
+                                    st.text(f"• {name} - {qual} - {title} - {frm} - {yrs} yrs")
 
                 st.markdown("### 📊 Summary by Role")
                 try:
                     summary_df = pd.DataFrame(summary_rows)
                     
-                    # Fill NaN values with "N/A" and format numbers as integers
-                    for col in summary_df.columns:
-                        if col != "Role":  # Don't modify the Role column
-                            # Convert to numeric, fill NaN with "N/A", then format as integer where applicable
-                            summary_df[col] = summary_df[col].apply(lambda x: "N/A" if pd.isna(x) else (int(x) if isinstance(x, (int, float)) else x))
+                    # Format counts as integers and fill columns a role doesn't use with "N/A" (Role is left as is)
+                    count_cols = [col for col in summary_df.columns if col != "Role"]
+                    counts = summary_df[count_cols].apply(pd.to_numeric, errors="coerce").astype("Int64")
+                    summary_df[count_cols] = counts.astype(object).where(counts.notna(), "N/A")
                     
                     st.dataframe(summary_df, use_container_width=True)
                 except Exception:
@@ -1364,6 +1832,76 @@ if st.session_state.step == 2 and st.session_state.df_personnel is not None:
 # =========================
 # STEP 3 — INLINE EDIT + PERSIST + GENERATE
 # =========================
+# The CV panel is a fragment, so clicking Generate reruns only this block instead of
+# the whole editor and validation above it
+@st.fragment
+def render_cv_panel(can_generate: bool):
+    st.markdown("#### 📝 Bulk CV Generation")
+    
+    if not can_generate:
+        st.error("⚠️ Cannot generate CVs: Fix critical issues above")
+        st.button(
+            "🚀 Generate CVs",
+            disabled=True,
+            type="primary",
+            use_container_width=True,
+            help="Fix all critical validation errors first"
+        )
+        st.caption("CVs cannot be generated with missing job titles")
+    elif st.button("🚀 Generate CVs", type="primary", use_container_width=True):
+        # Check if project info is available
+        if st.session_state.df_project_info is None:
+            st.error("❌ Project info not loaded. Please load project info in Step 1.")
+        else:
+            try:
+                # Show progress
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                status_text.text("⏳ Preparing data...")
+                progress_bar.progress(10)
+                
+                # Use current personnel data from session
+                df_personnel = st.session_state.df_personnel.copy()
+                df_projects = st.session_state.df_project_info.copy()
+                
+                status_text.text("⏳ Generating CVs...")
+                progress_bar.progress(30)
+                
+                # Run bulk generator straight into memory (no temp file to read back and delete)
+                out = io.BytesIO()
+                run_bulk_generator(
+                    personnel_df=df_personnel,
+                    project_info_df=df_projects,
+                    out_docx=out
+                )
+                
+                progress_bar.progress(80)
+                status_text.text("⏳ Preparing download...")
+                docx_bytes = out.getvalue()
+                
+                progress_bar.progress(100)
+                status_text.text("✅ Generation complete!")
+                
+                # Provide download button
+                st.download_button(
+                    "⬇️ Download Employees_CV.docx",
+                    docx_bytes,
+                    file_name="Employees_CV.docx",
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                    use_container_width=True
+                )
+                
+                st.success(f"✅ Generated CVs for {len(df_personnel)} personnel with random project assignments!")
+                
+            except Exception as e:
+                st.error(f"❌ CV generation failed: {e}")
+                import traceback
+                st.code(traceback.format_exc())
+    
+    if can_generate:
+        st.caption("Generates Word document with CVs for all personnel")
+
 if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     st.header("Step 3 — Edit Personnel & Generate CVs")
 
@@ -1402,6 +1940,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
         if st.button("🔄 Change Mode", use_container_width=True):
             st.session_state.job_title_mode = None
             st.session_state.defined_roles = []
+            st.session_state.defined_roles_set = set()
             st.session_state.roles_defined_step3 = False
             st.rerun()
     
@@ -1428,18 +1967,23 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                 col_btn1, col_btn2, col_btn3 = st.columns([2, 2, 4])
                 with col_btn1:
                     if st.button("💾 Add Role", type="primary", use_container_width=True):
+                        # Resync the lookup set if the list was replaced wholesale
+                        if len(st.session_state.defined_roles_set) != len(st.session_state.defined_roles):
+                            st.session_state.defined_roles_set = set(st.session_state.defined_roles)
                         if not role_name_input.strip():
                             st.error("❌ Role name cannot be empty!")
-                        elif role_name_input.strip() in st.session_state.defined_roles:
+                        elif role_name_input.strip() in st.session_state.defined_roles_set:
                             st.warning("⚠️ This role already exists!")
                         else:
                             st.session_state.defined_roles.append(role_name_input.strip())
+                            st.session_state.defined_roles_set.add(role_name_input.strip())
                             st.success(f"✅ Added role: {role_name_input.strip()}")
                             st.rerun()
                 
                 with col_btn2:
                     if st.button("🗑️ Clear All Roles", use_container_width=True):
                         st.session_state.defined_roles = []
+                        st.session_state.defined_roles_set = set()
                         st.success("All roles cleared.")
                         st.rerun()
             
@@ -1466,6 +2010,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                     st.write("")
                     if st.button("🗑️ Remove", use_container_width=True):
                         st.session_state.defined_roles.remove(role_to_remove)
+                        st.session_state.defined_roles_set.discard(role_to_remove)
                         st.success(f"Removed role: {role_to_remove}")
                         st.rerun()
                 
@@ -1511,59 +2056,33 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     else:
         st.info("💡 **Features**: Edit Name, Qualification, Job Title & From date inline. Add rows with +. Bulk assign job titles/dates. Auto-save on changes. Empty rows auto-removed. Format warnings won't block saving.")
 
-    # PRE-PROCESSING: Analyze and convert date formats
-    df_work = st.session_state.df_personnel.copy()
-    today = date.today()
-    default_to = f"{today.month:02d}-{today.year}"
-    
-    # Analyze "From" column for various formats
-    format_issues = []
-    converted_dates = []
-    
-    if "From" in df_work.columns:
-        for idx, val in enumerate(df_work["From"]):
-            if pd.notna(val) and str(val).strip() != "":
-                original = str(val).strip()
-                converted = convert_to_mm_yyyy_format(val)
-                
-                if converted == "":
-                    # Could not convert
-                    format_issues.append(f"Row {idx + 1}: '{original}' - unsupported format")
-                elif converted != original:
-                    # Was converted from different format
-                    converted_dates.append(f"Row {idx + 1}: '{original}' → '{converted}'")
-                    df_work.at[idx, "From"] = converted
-    
+    # PRE-PROCESSING: Analyze and convert date formats (cached on the frame's content)
+    df_src = st.session_state.df_personnel
+    today = date.today()  # one reading per rerun, shared by the pre-processing and YOE recalculation below
+    df_work, from_report, missing_counts = preprocess_step3(frame_fingerprint(df_src), today, df_src)
+    converted_count = from_report["converted_count"]
+    issue_count = from_report["issue_count"]
+
     # Show format analysis if any conversions or issues found
-    if format_issues or converted_dates:
+    if issue_count or converted_count:
         with st.expander("📋 Date Format Analysis & Conversion", expanded=True):
-            if converted_dates:
-                st.success(f"✅ Auto-converted {len(converted_dates)} date(s) to MM-YYYY format:")
+            if converted_count:
+                st.success(f"✅ Auto-converted {converted_count} date(s) to MM-YYYY format:")
                 st.caption("**Conversions Applied:**")
-                for msg in converted_dates[:10]:  # Show first 10
+                for msg in from_report["converted"]:  # Only the first few are formatted
                     st.write(f"• {msg}")
-                if len(converted_dates) > 10:
-                    st.caption(f"... and {len(converted_dates) - 10} more")
+                if converted_count > MESSAGE_PREVIEW_ROWS:
+                    st.caption(f"... and {converted_count - MESSAGE_PREVIEW_ROWS} more")
                 st.info("💡 **Supported formats**: Year only (2017 → 01-2017), DD-MM-YYYY (01-01-2006 → 01-2006), MM-YYYY (06-2022 → 06-2022)")
             
-            if format_issues:
-                st.warning(f"⚠️ {len(format_issues)} date(s) have unsupported formats and were set to empty:")
-                for issue in format_issues[:10]:
+            if issue_count:
+                st.warning(f"⚠️ {issue_count} date(s) have unsupported formats and were set to empty:")
+                for issue in from_report["issues"]:
                     st.write(f"• {issue}")
-                if len(format_issues) > 10:
-                    st.caption(f"... and {len(format_issues) - 10} more")
+                if issue_count > MESSAGE_PREVIEW_ROWS:
+                    st.caption(f"... and {issue_count - MESSAGE_PREVIEW_ROWS} more")
                 st.error("❌ **Action Required**: Please check and correct the formats. Use MM-YYYY format (e.g., 01-2020, 06-2022)")
     
-    # Ensure "To" column exists and is formatted
-    if "To" not in df_work.columns:
-        df_work["To"] = default_to
-    else:
-        df_work["To"] = df_work["To"].apply(lambda x: convert_to_mm_yyyy_format(x) if pd.notna(x) and str(x).strip() != "" else default_to)
-    
-    # Apply conversions to "From" column
-    if "From" in df_work.columns:
-        df_work["From"] = df_work["From"].apply(lambda x: convert_to_mm_yyyy_format(x) if pd.notna(x) else "")
-
     st.session_state.df_personnel = df_work
 
     # --- COLLAPSIBLE FORM FOR ADDING SINGLE USER ---
@@ -1578,7 +2097,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
             
             # Job Title - dropdown if in assign_roles mode, text input otherwise
             if st.session_state.job_title_mode == "assign_roles" and st.session_state.defined_roles:
-                job_title_options = st.session_state.defined_roles + ["Custom"]
+                job_title_options = job_title_choices(tuple(st.session_state.defined_roles))
                 selected_job_title = st.selectbox(
                     "Job Title *",
                     options=job_title_options,
@@ -1611,7 +2130,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                 errors.append("❌ Job Title is required")
             if not new_from.strip():
                 errors.append("❌ From date is required")
-            elif not re.match(r'^\d{1,2}-\d{4}$', new_from.strip()):
+            elif not MM_YYYY_STRICT_RE.match(new_from.strip()):
                 errors.append("❌ From date must be in MM-YYYY format (e.g., 01-2020 or 11-2022)")
             
             if errors:
@@ -1633,7 +2152,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                         
                         # Calculate YOE automatically
                         from_date = parse_from_to_date(formatted_from)
-                        calculated_yoe = years_since(from_date) if from_date else 0
+                        calculated_yoe = years_since(from_date, today) if from_date else 0
                         
                         new_row = {
                             "Name": new_name.strip(),
@@ -1641,17 +2160,14 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                             "Job Title": new_job_title.strip(),
                             "From": formatted_from,
                             "To": "Present",
-                            "Years of Experience": calculated_yoe
+                            "Years of Experience": calculated_yoe,
+                            "Assigned Role": "",
                         }
-                        df_work = st.session_state.df_personnel.copy()
-                        df_work = pd.concat([df_work, pd.DataFrame([new_row])], ignore_index=True)
+                        # Append in place (the schema is complete, see ensure_required_cols) instead of concat-copying
+                        df_work = st.session_state.df_personnel.reset_index(drop=True)
+                        df_work.loc[len(df_work)] = new_row
                         st.session_state.df_personnel = df_work
-                        
-                        # Auto-save
-                        if st.session_state.current_edit_path is None:
-                            st.session_state.current_edit_path = save_temp_excel(df_work)
-                        else:
-                            save_temp_excel(df_work, fixed_path=st.session_state.current_edit_path)
+                        # Not saved here: the grid commit on the rerun below autosaves the final frame
                         
                         st.success(f"✅ Added user: {new_name.strip()} | YOE: {calculated_yoe} years")
                         st.rerun()
@@ -1665,66 +2181,36 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     with col_info1:
         st.metric("Total Personnel", len(st.session_state.df_personnel))
     with col_info2:
-        selected_count = 0
-        if st.session_state.selection_mask is not None and st.session_state.selection_mask.any():
-            selected_count = int(st.session_state.selection_mask.sum())
-        st.metric("Selected", selected_count)
+        st.metric("Selected", st.session_state.selection_count)
     with col_info3:
-        # Show job title assignment status
-        df_check = st.session_state.df_personnel.copy()
-        if "Job Title" in df_check.columns:
-            assigned = (~df_check["Job Title"].isna()) & (df_check["Job Title"].astype(str).str.strip() != "")
-            assigned_count = assigned.sum()
-            unassigned_count = len(df_check) - assigned_count
+        # Show job title assignment status (blank titles were counted during pre-processing)
+        if "Job Title" in missing_counts:
+            total_count = len(st.session_state.df_personnel)
+            unassigned_count = missing_counts["Job Title"]
+            assigned_count = total_count - unassigned_count
             
             if unassigned_count > 0:
-                st.metric("Job Titles Assigned", f"{assigned_count}/{len(df_check)}", delta=f"-{unassigned_count} missing", delta_color="inverse")
+                st.metric("Job Titles Assigned", f"{assigned_count}/{total_count}", delta=f"-{unassigned_count} missing", delta_color="inverse")
             else:
-                st.metric("Job Titles Assigned", f"{assigned_count}/{len(df_check)}", delta="All assigned")
+                st.metric("Job Titles Assigned", f"{assigned_count}/{total_count}", delta="All assigned")
     with col_info4:
         st.caption("✏️ **Editable Table**: Edit inline. + to add rows. Empty rows auto-deleted. Select checkboxes for bulk operations.")
 
-    # Show quick alert if there are any missing critical fields
-    df_alert_check = st.session_state.df_personnel.copy()
-    missing_fields = []
-    
-    # Check Name
-    if "Name" in df_alert_check.columns:
-        missing_names = (df_alert_check["Name"].isna() | (df_alert_check["Name"].astype(str).str.strip() == "")).sum()
-        if missing_names > 0:
-            missing_fields.append(f"{missing_names} Name(s)")
-    
-    # Check Job Title
-    if "Job Title" in df_alert_check.columns:
-        missing_jt = (df_alert_check["Job Title"].isna() | (df_alert_check["Job Title"].astype(str).str.strip() == "")).sum()
-        if missing_jt > 0:
-            missing_fields.append(f"{missing_jt} Job Title(s)")
-    
-    # Check Qualification
-    if "Qualification" in df_alert_check.columns:
-        missing_qual = (df_alert_check["Qualification"].isna() | (df_alert_check["Qualification"].astype(str).str.strip() == "")).sum()
-        if missing_qual > 0:
-            missing_fields.append(f"{missing_qual} Qualification(s)")
-    
-    # Check From date
-    if "From" in df_alert_check.columns:
-        missing_from = (df_alert_check["From"].isna() | (df_alert_check["From"].astype(str).str.strip() == "")).sum()
-        if missing_from > 0:
-            missing_fields.append(f"{missing_from} From Date(s)")
+    # Show quick alert if there are any missing critical fields (counted during pre-processing)
+    missing_labels = {"Name": "Name(s)", "Job Title": "Job Title(s)", "Qualification": "Qualification(s)", "From": "From Date(s)"}
+    missing_fields = [f"{n} {missing_labels[col]}" for col, n in missing_counts.items() if n > 0]
     
     if missing_fields:
         st.warning(f"⚠️ **Missing Required Data**: {', '.join(missing_fields)} - Please complete all required fields before downloading or generating CVs.")
 
     # --- Editable grid with auto-save ---
-    df_edit = st.session_state.df_personnel.copy()
-    
-    # Remove 'Assigned Role' from display (not shown in UI or temp Excel)
-    if "Assigned Role" in df_edit.columns:
-        df_edit = df_edit.drop(columns=["Assigned Role"])
+    # Remove 'Assigned Role' from display (not shown in UI or temp Excel); drop() gives the one copy we edit
+    df_edit = st.session_state.df_personnel.drop(columns=["Assigned Role"], errors="ignore")
     
     # Convert date columns to string and ensure proper format
     if "From" in df_edit.columns:
-        df_edit["From"] = df_edit["From"].apply(lambda x: str(x) if pd.notna(x) and str(x).strip() != "" else "")
+        from_str = df_edit["From"].astype(object).astype(str)
+        df_edit["From"] = from_str.where(df_edit["From"].notna() & from_str.str.strip().ne(""), "")
     
     # Display "Present" for To column
     if "To" in df_edit.columns:
@@ -1732,44 +2218,20 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     
     # Ensure YOE is integer
     if "Years of Experience" in df_edit.columns:
-        df_edit["Years of Experience"] = df_edit["Years of Experience"].apply(lambda x: int(float(x)) if pd.notna(x) else 0)
+        df_edit["Years of Experience"] = pd.to_numeric(df_edit["Years of Experience"], errors="coerce").fillna(0).astype("int64")
     
     if "Select" not in df_edit.columns:
         df_edit.insert(0, "Select", False)
 
     # Column configuration - Name, Qualification, Job Title, From are editable
-    # Job Title uses selectbox if in assign_roles mode
-    if st.session_state.job_title_mode == "assign_roles" and st.session_state.defined_roles:
-        column_config = {
-            "Select": st.column_config.CheckboxColumn("Select", default=False, width="small"),
-            "Name": st.column_config.TextColumn("Name", width="medium", required=True),
-            "Qualification": st.column_config.TextColumn("Qualification", width="medium", required=True),
-            "Job Title": st.column_config.SelectboxColumn(
-                "Job Title",
-                width="medium",
-                options=st.session_state.defined_roles,
-                required=True,
-                help="Select from defined roles"
-            ),
-            "From": st.column_config.TextColumn("From (MM-YYYY)", width="small", required=True, help="Format: MM-YYYY (e.g., 01-2020)"),
-            "To": st.column_config.TextColumn("To", width="small"),
-            "Years of Experience": st.column_config.NumberColumn("YOE (Years)", width="small", format="%d"),
-        }
-    else:
-        column_config = {
-            "Select": st.column_config.CheckboxColumn("Select", default=False, width="small"),
-            "Name": st.column_config.TextColumn("Name", width="medium", required=True),
-            "Qualification": st.column_config.TextColumn("Qualification", width="medium", required=True),
-            "Job Title": st.column_config.TextColumn("Job Title", width="medium", required=True),
-            "From": st.column_config.TextColumn("From (MM-YYYY)", width="small", required=True, help="Format: MM-YYYY (e.g., 01-2020)"),
-            "To": st.column_config.TextColumn("To", width="small"),
-            "Years of Experience": st.column_config.NumberColumn("YOE (Years)", width="small", format="%d"),
-        }
+    # Job Title uses selectbox if in assign_roles mode (built once per mode/role list)
+    assign_roles_grid = st.session_state.job_title_mode == "assign_roles" and bool(st.session_state.defined_roles)
+    column_config = grid_column_config(assign_roles_grid, tuple(st.session_state.defined_roles) if assign_roles_grid else ())
     
     # Disable columns that shouldn't be editable
     disabled_columns = ["To", "Years of Experience"]
 
-    if st.session_state.job_title_mode == "assign_roles" and st.session_state.defined_roles:
+    if assign_roles_grid:
         st.caption("⚠️ **Editable**: Name, Qualification, Job Title (dropdown: defined roles), From (MM-YYYY format) | **Auto-calculated**: To (Present), Years of Experience")
     else:
         st.caption("⚠️ **Editable**: Name, Qualification, Job Title, From (MM-YYYY format) | **Auto-calculated**: To (Present), Years of Experience")
@@ -1785,53 +2247,52 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     )
 
     # Commit edits with auto-save and validation
+    personnel_fp = None  # fingerprint of the committed df_personnel, reused by validation and download
     if isinstance(edited, pd.DataFrame):
         if "Select" in edited.columns:
-            st.session_state.selection_mask = edited["Select"].fillna(False).astype(bool).values
+            selection = edited["Select"].fillna(False).to_numpy(dtype=bool)
+            st.session_state.selection_mask = selection
+            st.session_state.selection_count = int(selection.sum())
             edited = edited.drop(columns=["Select"])
         else:
             st.session_state.selection_mask = None
-
-        # Filter out completely empty rows before validation
-        def is_row_empty(row):
-            """Check if a row is completely empty (all values are NaN or empty strings)"""
-            for val in row:
-                if pd.notna(val) and str(val).strip() != "":
-                    return False
-            return True
-        
-        # Remove completely empty rows
-        empty_mask = edited.apply(is_row_empty, axis=1)
-        if empty_mask.any():
-            num_empty = empty_mask.sum()
+            st.session_state.selection_count = 0
+
+        # Remove completely empty rows (every cell NaN or blank) before validation
+        # (the stripped cells and blank mask are reused by the From check below)
+        cells = edited.to_numpy(dtype=object)
+        stripped = np.char.strip(cells.astype(str))
+        blank_cells = pd.isna(cells) | (stripped == "")
+        empty_mask = blank_cells.all(axis=1)
+        num_empty = int(empty_mask.sum())
+        if num_empty:
             edited = edited[~empty_mask].reset_index(drop=True)
+            stripped = stripped[~empty_mask]
+            blank_cells = blank_cells[~empty_mask]
             st.info(f"ℹ️ Removed {num_empty} empty row(s) automatically")
 
         # Validate From column format (MM-YYYY) - only for non-empty values
         validation_warnings = []
         if "From" in edited.columns and len(edited) > 0:
-            for idx, row in edited.iterrows():
-                val = row.get("From")
-                # Only validate if From has a value
-                if pd.notna(val) and str(val).strip() != "":
-                    val_str = str(val).strip()
-                    # Check if it's already in datetime format (from Excel)
-                    if not re.match(r'^\d{1,2}[-/]\d{4}$', val_str):
-                        # Try to parse as datetime
-                        try:
-                            pd.to_datetime(val)
-                            # It's a valid date, we'll convert it in recalc_yoe_for_from_column
-                        except:
-                            validation_warnings.append(f"Row {idx + 1}: 'From' date format may need correction (use MM-YYYY like 01-2020)")
-                    else:
-                        # Validate month range for MM-YYYY format
-                        try:
-                            parts = val_str.split('-') if '-' in val_str else val_str.split('/')
-                            month = int(parts[0])
-                            if month < 1 or month > 12:
-                                validation_warnings.append(f"Row {idx + 1}: Invalid month '{month}'. Must be between 01 and 12")
-                        except:
-                            validation_warnings.append(f"Row {idx + 1}: Could not parse 'From' date")
+            from_col = edited["From"]
+            from_pos = edited.columns.get_loc("From")
+            val_str = pd.Series(stripped[:, from_pos], index=edited.index)
+            # Only validate if From has a value
+            present = pd.Series(~blank_cells[:, from_pos], index=edited.index)
+            month = pd.to_numeric(val_str.str.extract(MM_YYYY_RE)[0], errors="coerce")
+            is_mm_yyyy = present & month.notna()
+            # Validate month range for MM-YYYY format
+            bad_month = (is_mm_yyyy & ~month.between(1, 12)).to_numpy(dtype=bool)
+            # Anything else must at least parse as a date (we'll convert it in recalc_yoe_for_from_column)
+            other = (present & ~is_mm_yyyy).to_numpy(dtype=bool)
+            unparsable = np.zeros(len(edited), dtype=bool)
+            unparsable[other] = unparsable_dates(from_col[other])
+            for i in np.flatnonzero(bad_month | unparsable):
+                idx = edited.index[i]
+                if bad_month[i]:
+                    validation_warnings.append(f"Row {idx + 1}: Invalid month '{int(month.iat[i])}'. Must be between 01 and 12")
+                else:
+                    validation_warnings.append(f"Row {idx + 1}: 'From' date format may need correction (use MM-YYYY like 01-2020)")
         
         # Show validation warnings but don't block saving
         if validation_warnings:
@@ -1843,25 +2304,19 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
         
         # Always save, even with warnings
         # Recalculate YOE based on From dates
-        edited = recalc_yoe_for_from_column(edited)
-        
-        # Add back 'Assigned Role' column if it doesn't exist (for internal use)
-        if "Assigned Role" not in edited.columns:
-            edited["Assigned Role"] = ""
+        edited = recalc_yoe_for_from_column(edited, today)
         
         # Ensure To column is "Present"
         edited["To"] = "Present"
         
-        # Ensure required columns exist
-        edited = ensure_required_cols(edited)
+        # Ensure required columns exist (this also adds back the internal 'Assigned Role' column the grid hides)
+        edited = downcast_text_columns(ensure_required_cols(edited))
         
         st.session_state.df_personnel = edited
 
-        # Auto-save to temp file (first time create, then overwrite)
-        if st.session_state.current_edit_path is None:
-            st.session_state.current_edit_path = save_temp_excel(edited)  # timestamped
-        else:
-            save_temp_excel(edited, fixed_path=st.session_state.current_edit_path)
+        # Auto-save to temp file (first time create, then overwrite). This is the single save point:
+        # Add User, bulk assign and delete only update df_personnel and rerun, landing here
+        personnel_fp = autosave_personnel(edited)
 
     st.divider()
     st.subheader("🛠️ Bulk Assignment")
@@ -1903,7 +2358,7 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
             # If in assign_roles mode, show dropdown with defined roles + Custom option
             if st.session_state.job_title_mode == "assign_roles" and st.session_state.defined_roles:
                 help_text = "💼 Select from defined roles or choose 'Custom' to enter your own"
-                role_options = st.session_state.defined_roles + ["Custom"]
+                role_options = job_title_choices(tuple(st.session_state.defined_roles))
                 selected_role = st.selectbox(
                     "Select Role to Assign",
                     options=role_options,
@@ -1939,14 +2394,14 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
         st.write("")  # Spacing
         if st.button("✅ Apply to Selected", type="primary", use_container_width=True):
             mask = st.session_state.selection_mask
-            if mask is None or not mask.any():
+            if st.session_state.selection_count == 0:
                 st.warning("⚠️ No rows selected. Please select rows using checkboxes.")
             elif not bulk_value.strip():
                 st.error(f"❌ {bulk_column} cannot be empty!")
             else:
                 # Validation based on column type
                 if bulk_column == "From":
-                    if not re.match(r'^\d{1,2}-\d{4}$', bulk_value.strip()):
+                    if not MM_YYYY_STRICT_RE.match(bulk_value.strip()):
                         st.error("❌ Invalid format. Please use MM-YYYY (e.g., 01-2020)")
                     else:
                         # Validate month range
@@ -1956,30 +2411,22 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                             if month < 1 or month > 12:
                                 st.error(f"❌ Invalid month '{month}'. Must be between 01 and 12")
                             else:
-                                dfx = st.session_state.df_personnel.copy()
+                                # Written in place: nothing else holds on to the session frame
+                                dfx = st.session_state.df_personnel
                                 dfx.loc[mask, "From"] = bulk_value.strip()
-                                dfx = recalc_yoe_for_from_column(dfx)
-                                st.session_state.df_personnel = dfx
-                                if st.session_state.current_edit_path is None:
-                                    st.session_state.current_edit_path = save_temp_excel(dfx)
-                                else:
-                                    save_temp_excel(dfx, fixed_path=st.session_state.current_edit_path)
-                                st.success(f"✅ Assigned '{bulk_value}' to {int(mask.sum())} person(s). YOE recalculated.")
+                                st.session_state.df_personnel = recalc_yoe_for_from_column(dfx, today)
+                                st.success(f"✅ Assigned '{bulk_value}' to {st.session_state.selection_count} person(s). YOE recalculated.")
                                 st.rerun()
                         except:
                             st.error("❌ Invalid date format")
                 else:
                     # Job Title or Qualification
-                    dfx = st.session_state.df_personnel.copy()
-                    dfx.loc[mask, bulk_column] = bulk_value.strip()
-                    if bulk_column == "Job Title" and "Assigned Role" in dfx.columns:
-                        dfx.loc[mask, "Assigned Role"] = bulk_value.strip()
+                    dfx = st.session_state.df_personnel  # written in place
+                    # Job Title also updates Assigned Role, in the same .loc write
+                    cols = [bulk_column] + (["Assigned Role"] if bulk_column == "Job Title" and "Assigned Role" in dfx.columns else [])
+                    dfx.loc[mask, cols] = bulk_value.strip()
                     st.session_state.df_personnel = dfx
-                    if st.session_state.current_edit_path is None:
-                        st.session_state.current_edit_path = save_temp_excel(dfx)
-                    else:
-                        save_temp_excel(dfx, fixed_path=st.session_state.current_edit_path)
-                    st.success(f"✅ Assigned '{bulk_value}' to {bulk_column} for {int(mask.sum())} person(s)")
+                    st.success(f"✅ Assigned '{bulk_value}' to {bulk_column} for {st.session_state.selection_count} person(s)")
                     st.rerun()
 
     st.divider()
@@ -1990,24 +2437,19 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     with col_delete:
         if st.button("🗑️ Delete Selected", key="delete_btn"):
             mask = st.session_state.selection_mask
-            if mask is None or not mask.any():
+            if st.session_state.selection_count == 0:
                 st.warning("⚠️ No rows selected. Use checkboxes to select rows to delete.")
             else:
-                num_to_delete = int(mask.sum())
+                num_to_delete = st.session_state.selection_count
                 kept = st.session_state.df_personnel.loc[~mask].reset_index(drop=True)
                 st.session_state.df_personnel = kept
-                if st.session_state.current_edit_path is None:
-                    st.session_state.current_edit_path = save_temp_excel(kept)
-                else:
-                    save_temp_excel(kept, fixed_path=st.session_state.current_edit_path)
                 st.session_state.selection_mask = None
+                st.session_state.selection_count = 0
                 st.success(f"✅ Deleted {num_to_delete} row(s)")
                 st.rerun()
     
     with col_selected:
-        mask = st.session_state.selection_mask
-        selected_count = int(mask.sum()) if mask is not None and mask.any() else 0
-        st.info(f"📊 **Selected**: {selected_count} row(s)")
+        st.info(f"📊 **Selected**: {st.session_state.selection_count} row(s)")
     
     with col_info:
         st.caption("💡 **Tip**: Select rows with checkboxes, then delete or use bulk tools above")
@@ -2028,116 +2470,9 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
     # =========================
     # VALIDATION BEFORE DOWNLOAD/GENERATE
     # =========================
-    validation_errors = []
-    validation_warnings = []
-    df_validation = st.session_state.df_personnel.copy()
-    
-    # Helper function to get name or row number
-    def get_row_identifier(idx):
-        if "Name" in df_validation.columns and pd.notna(df_validation.loc[idx, "Name"]) and str(df_validation.loc[idx, "Name"]).strip() != "":
-            return f"Row {idx+1}: {df_validation.loc[idx, 'Name']}"
-        return f"Row {idx+1}"
-    
-    # Check for empty Names - CRITICAL
-    if "Name" in df_validation.columns:
-        empty_names = df_validation["Name"].isna() | (df_validation["Name"].astype(str).str.strip() == "")
-        if empty_names.any():
-            empty_count = empty_names.sum()
-            empty_indices = df_validation[empty_names].index.tolist()
-            validation_errors.append({
-                "title": "❌ Missing Names",
-                "count": empty_count,
-                "details": [f"Row {idx+1}" for idx in empty_indices[:10]],
-                "message": f"{empty_count} personnel have no name assigned"
-            })
-    
-    # Check for empty Job Titles - CRITICAL
-    if "Job Title" in df_validation.columns:
-        empty_job_titles = df_validation["Job Title"].isna() | (df_validation["Job Title"].astype(str).str.strip() == "")
-        if empty_job_titles.any():
-            empty_indices = df_validation[empty_job_titles].index.tolist()
-            empty_names = []
-            for idx in empty_indices:
-                empty_names.append(get_row_identifier(idx))
-            validation_errors.append({
-                "title": "❌ Missing Job Titles",
-                "count": len(empty_indices),
-                "details": empty_names[:10],
-                "message": f"{len(empty_indices)} personnel have no job title assigned"
-            })
-    
-    # Check for empty Qualifications - CRITICAL
-    if "Qualification" in df_validation.columns:
-        empty_qual = df_validation["Qualification"].isna() | (df_validation["Qualification"].astype(str).str.strip() == "")
-        if empty_qual.any():
-            empty_count = empty_qual.sum()
-            empty_indices = df_validation[empty_qual].index.tolist()
-            qual_names = []
-            for idx in empty_indices:
-                qual_names.append(get_row_identifier(idx))
-            validation_errors.append({
-                "title": "❌ Missing Qualifications",
-                "count": empty_count,
-                "details": qual_names[:10],
-                "message": f"{empty_count} personnel have no qualification assigned"
-            })
-    
-    # Check for empty From dates - CRITICAL
-    if "From" in df_validation.columns:
-        empty_from = df_validation["From"].isna() | (df_validation["From"].astype(str).str.strip() == "")
-        if empty_from.any():
-            empty_count = empty_from.sum()
-            empty_indices = df_validation[empty_from].index.tolist()
-            from_names = []
-            for idx in empty_indices:
-                from_names.append(get_row_identifier(idx))
-            validation_errors.append({
-                "title": "❌ Missing From Dates",
-                "count": empty_count,
-                "details": from_names[:10],
-                "message": f"{empty_count} personnel have no 'From' date (Years of Experience will be 0)"
-            })
-    
-    # Check for invalid From date format - WARNING
-    if "From" in df_validation.columns:
-        invalid_format = []
-        for idx, row in df_validation.iterrows():
-            val = row.get("From")
-            if pd.notna(val) and str(val).strip() != "":
-                val_str = str(val).strip()
-                # Check if format is MM-YYYY or valid date
-                if not re.match(r'^\d{1,2}[-/]\d{4}$', val_str):
-                    try:
-                        pd.to_datetime(val)
-                    except:
-                        invalid_format.append((idx, val_str))
-        
-        if invalid_format:
-            details = []
-            for idx, val in invalid_format[:10]:
-                details.append(f"{get_row_identifier(idx)} - '{val}'")
-            validation_warnings.append({
-                "title": "⚠️ Invalid From Date Format",
-                "count": len(invalid_format),
-                "details": details,
-                "message": f"{len(invalid_format)} personnel have 'From' dates in unsupported format (use MM-YYYY like 01-2020)"
-            })
-    
-    # Check for Zero Years of Experience - WARNING
-    if "Years of Experience" in df_validation.columns:
-        zero_yoe = df_validation["Years of Experience"].fillna(0) == 0
-        if zero_yoe.any():
-            zero_count = zero_yoe.sum()
-            zero_indices = df_validation[zero_yoe].index.tolist()
-            yoe_names = []
-            for idx in zero_indices[:10]:
-                yoe_names.append(get_row_identifier(idx))
-            validation_warnings.append({
-                "title": "⚠️ Zero Years of Experience",
-                "count": zero_count,
-                "details": yoe_names,
-                "message": f"{zero_count} personnel have 0 years of experience (may need 'From' date correction)"
-            })
+    if personnel_fp is None:
+        personnel_fp = frame_fingerprint(st.session_state.df_personnel)
+    validation_errors, validation_warnings = validate_personnel(personnel_fp, st.session_state.df_personnel)
     
     # Display validation results in expander
     if validation_errors or validation_warnings:
@@ -2216,22 +2551,13 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
                 help="Fix all critical validation errors first"
             )
         else:
-            # Prepare Excel download with all changes
-            buf = io.BytesIO()
-            df_download = st.session_state.df_personnel.copy()
-            # Remove Assigned Role if exists
-            if "Assigned Role" in df_download.columns:
-                df_download = df_download.drop(columns=["Assigned Role"])
-            # Ensure To is "Present" and YOE is integer
-            df_download["To"] = "Present"
-            if "Years of Experience" in df_download.columns:
-                df_download["Years of Experience"] = df_download["Years of Experience"].apply(lambda x: int(float(x)) if pd.notna(x) else 0)
-            df_download.to_excel(buf, index=False)
-            buf.seek(0)
+            # Prepare Excel download with all changes (rebuilt only when the data changes)
+            df_download = st.session_state.df_personnel
+            xlsx_bytes = personnel_xlsx_bytes(personnel_fp, df_download)
             
             st.download_button(
                 "⬇️ Download Excel",
-                buf,
+                xlsx_bytes,
                 file_name="Personnel_download.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
@@ -2240,77 +2566,4 @@ if st.session_state.step == 3 and st.session_state.df_personnel is not None:
         st.caption("Downloads current personnel data with all your changes")
 
     with col2:
-        st.markdown("#### 📝 Bulk CV Generation")
-        
-        # Disable CV generation if there are critical errors
-        can_generate = len(validation_errors) == 0
-        
-        if not can_generate:
-            st.error("⚠️ Cannot generate CVs: Fix critical issues above")
-            st.button(
-                "🚀 Generate CVs",
-                disabled=True,
-                type="primary",
-                use_container_width=True,
-                help="Fix all critical validation errors first"
-            )
-            st.caption("CVs cannot be generated with missing job titles")
-        elif st.button("🚀 Generate CVs", type="primary", use_container_width=True):
-            # Check if project info is available
-            if st.session_state.df_project_info is None:
-                st.error("❌ Project info not loaded. Please load project info in Step 1.")
-            else:
-                try:
-                    # Show progress
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    status_text.text("⏳ Preparing data...")
-                    progress_bar.progress(10)
-                    
-                    # Use current personnel data from session
-                    df_personnel = st.session_state.df_personnel.copy()
-                    df_projects = st.session_state.df_project_info.copy()
-                    
-                    status_text.text("⏳ Generating CVs...")
-                    progress_bar.progress(30)
-                    
-                    # Run bulk generator
-                    run_bulk_generator(
-                        personnel_df=df_personnel,
-                        project_info_df=df_projects,
-                        out_docx=OUTPUT_DOCX
-                    )
-                    
-                    progress_bar.progress(80)
-                    status_text.text("⏳ Preparing download...")
-                    
-                    # Read the generated file
-                    with open(OUTPUT_DOCX, "rb") as f:
-                        docx_bytes = f.read()
-                    
-                    progress_bar.progress(100)
-                    status_text.text("✅ Generation complete!")
-                    
-                    # Provide download button
-                    st.download_button(
-                        "⬇️ Download Employees_CV.docx",
-                        docx_bytes,
-                        file_name="Employees_CV.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True
-                    )
-                    
-                    # Clean up - delete the file after download
-                    if os.path.exists(OUTPUT_DOCX):
-                        os.remove(OUTPUT_DOCX)
-                    
-                    st.success(f"✅ Generated CVs for {len(df_personnel)} personnel with random project assignments!")
-                    
-                except Exception as e:
-                    st.error(f"❌ CV generation failed: {e}")
-                    import traceback
-                    st.code(traceback.format_exc())
-        
-        if can_generate:
-            st.caption("Generates Word document with CVs for all personnel")
+        render_cv_panel(len(validation_errors) == 0)